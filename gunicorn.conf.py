@@ -0,0 +1,37 @@
+"""gunicorn settings, all overridable from the environment.
+
+``gunicorn`` picks this file up automatically from the working directory.
+The default uvicorn workers serve the ASGI app, so the async storefront views
+and eBay proxy run on the event loop instead of through ``async_to_sync``.
+``GUNICORN_WORKER_CLASS=gthread`` serves the WSGI app with threads instead.
+"""
+import multiprocessing
+import os
+
+
+def _int(name, default):
+    return int(os.getenv(name) or default)
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'uvicorn_worker.UvicornWorker')
+asgi = 'uvicorn' in worker_class.lower()
+wsgi_app = 'skuportal.asgi:application' if asgi else 'skuportal.wsgi:application'
+if asgi:
+    # Sync views run on a fresh thread per request under ASGI, so kept connections are never reused
+    os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+# WEB_CONCURRENCY is the name most hosts (Fly, Heroku, Render) already set
+workers = _int('GUNICORN_WORKERS', os.getenv('WEB_CONCURRENCY') or multiprocessing.cpu_count() * 2 + 1)
+threads = _int('GUNICORN_THREADS', 4)  # per gthread worker
+timeout = _int('GUNICORN_TIMEOUT', 60)  # long exports run as background jobs
+graceful_timeout = _int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _int('GUNICORN_KEEPALIVE', 5)
+# Recycle workers now and then so slow leaks cannot grow without bound
+max_requests = _int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+# Thread pools and DB connections are created lazily, so the app is safe to preload
+preload_app = os.getenv('GUNICORN_PRELOAD', '0') == '1'
+forwarded_allow_ips = os.getenv('FORWARDED_ALLOW_IPS', '*')
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
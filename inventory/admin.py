@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product, Variant, ProductImage
+from .models import Job, PriceComp, Product, Variant, ProductImage
 
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
@@ -11,7 +11,7 @@ class VariantInline(admin.TabularInline):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('main_sku','name','brand','category','created_at')
+    list_display = ('main_sku','name','brand','category','variant_count','total_qty','created_at')
     search_fields = ('main_sku','name','brand')
     inlines = [VariantInline]
 
@@ -24,3 +24,13 @@ class VariantAdmin(admin.ModelAdmin):
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
     list_display = ('variant','uploaded_at')
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id','kind','status','done','total','created_by','created_at','finished_at')
+    list_filter = ('kind','status')
+
+@admin.register(PriceComp)
+class PriceCompAdmin(admin.ModelAdmin):
+    list_display = ('variant','suggested_price','median','count','fetched_at')
+    search_fields = ('variant__variant_sku','query')
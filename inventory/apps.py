@@ -1,4 +1,6 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
 
 
 class InventoryConfig(AppConfig):
@@ -8,3 +10,7 @@ class InventoryConfig(AppConfig):
     def ready(self):
         # Import signal handlers
         from . import signals  # noqa: F401
+        if getattr(settings, 'JOBS_RUN_IN_PROCESS', True):
+            # Not here directly: ready() also runs for migrate and friends, before the tables exist
+            from .jobs import recover_on_first_request
+            request_started.connect(recover_on_first_request, dispatch_uid='inventory.jobs.recover')
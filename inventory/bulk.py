@@ -0,0 +1,115 @@
+"""Set-based bulk edits from the dashboard's bulk bar.
+
+:func:`apply` writes each field group with one queryset ``.update()`` per
+chunk of products: the category in one statement on the products, and
+status, location and price (with the fees, net, profit and margin derived
+from it) in one statement on their variants.  Repricing follows
+``Variant.save``: fees that were auto-calculated follow the new price, fees
+typed in by hand are kept.
+
+Queryset updates skip the model signals, so instead of a signal per row the
+edit sends one :data:`inventory.signals.variants_changed` carrying the
+affected ids and the fields written; its receiver refreshes the search index,
+rollups, card stamps, suggestion lists and the CSV snapshot for just those.
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from django.db.models import F, Value
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+from . import stats
+from .constants import STATUSES
+from .finance import CENT, MAX_MONEY, MONEY, financial_updates, money
+from .models import Product, Variant
+from .signals import variants_changed
+
+_CHUNK = 500
+_MAX_PERCENT = Decimal(10000)  # up to 101 times the price
+
+
+@dataclass
+class BulkResult:
+    products: int = 0
+    variants: int = 0
+    fields: set = field(default_factory=set)
+
+
+def _decimal(value, name, maximum):
+    try:
+        value = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'{name} must be a number.')
+    if not value.is_finite():
+        raise ValueError(f'{name} must be a number.')
+    if abs(value) > maximum:
+        raise ValueError(f'{name} is out of range (at most {maximum:,}).')
+    return value
+
+
+def variant_updates(status='', location='', price=None, reprice_percent=None):
+    """``Variant.objects.update()`` values for the requested changes.
+
+    ``price`` sets every price; ``reprice_percent`` scales the current prices
+    (``-10`` is 10% off).  Raises ``ValueError`` for invalid input, including
+    amounts too large for the money columns.
+    """
+    values = {}
+    if status:
+        if status not in STATUSES:
+            raise ValueError(f'Unknown status "{status}".')
+        values['status'] = status
+    if location:
+        values['location'] = location
+    if price not in (None, '') and reprice_percent not in (None, ''):
+        raise ValueError('Set a price or reprice by a percentage, not both.')
+    if price not in (None, ''):
+        price = _decimal(price, 'Price', MAX_MONEY).quantize(CENT)
+        if price < 0:
+            raise ValueError('Price cannot be negative.')
+        values.update(financial_updates(Value(price, output_field=MONEY)))
+    elif reprice_percent not in (None, ''):
+        percent = _decimal(reprice_percent, 'Repricing percentage', _MAX_PERCENT)
+        if percent <= -100:
+            raise ValueError('Repricing percentage must be above -100.')
+        if percent:
+            values.update(financial_updates(money(F('price') * Value(1 + percent / 100))))
+    return values
+
+
+def apply(product_ids, category='', **changes) -> BulkResult:
+    """Apply the bulk bar's changes to the given products and all of their variants.
+
+    ``changes`` are the keyword arguments of :func:`variant_updates`.  Raises
+    ``ValueError``, changing nothing, when a reprice would take any price past
+    what the price column holds.
+    """
+    ids = sorted({int(pk) for pk in product_ids if str(pk).isdigit()})
+    variant_values = variant_updates(**changes)
+    result = BulkResult()
+    if category:
+        result.fields.add('category')
+    result.fields.update(f for f in variant_values if f in ('status', 'location', 'price'))
+    if not ids or not result.fields:
+        return result
+    if variant_values:
+        variant_values['updated_at'] = timezone.now()
+
+    variant_ids = []
+    with stats.track_products(ids):  # one transaction
+        for i in range(0, len(ids), _CHUNK):
+            chunk = ids[i:i + _CHUNK]
+            if category:
+                result.products += Product.objects.filter(pk__in=chunk).update(category=category)
+            if variant_values:
+                variants = Variant.objects.filter(product_id__in=chunk)
+                if 'price' in variant_values and variants.filter(
+                    GreaterThan(variant_values['price'], Value(MAX_MONEY)),
+                ).exists():
+                    # Rolls back the chunks already written
+                    raise ValueError(f'New prices must be at most {MAX_MONEY:,}; nothing was changed.')
+                variant_ids += variants.values_list('pk', flat=True)
+                result.variants += variants.update(**variant_values)
+        variants_changed.send(
+            sender=Variant, product_ids=ids, variant_ids=variant_ids, fields=frozenset(result.fields),
+        )
+    return result
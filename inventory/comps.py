@@ -0,0 +1,113 @@
+"""eBay price comparables for many variants at once.
+
+Each variant's query is built from brand, name and size (the same words the
+product form's eBay panel searches for).  Variants sharing a query share one
+lookup; distinct queries are fanned out over a thread pool of
+``EBAY_COMPS_CONCURRENCY`` workers that all use the shared, pooled
+``EbayClient`` and the search cache.  The outcome is stored per variant in
+``PriceComp``.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from decimal import ROUND_FLOOR, Decimal
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .ebay import cached_search, normalize_query
+from .exports import to_list_variants
+from .models import PriceComp, Variant
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+CENT = Decimal('0.01')
+
+
+@dataclass
+class CompsResult:
+    priced: int = 0
+    failed: int = 0
+    queries: int = 0
+
+
+def comp_query(variant):
+    p = variant.product
+    bits = [(p.brand or '').strip(), (p.name or '').strip()]
+    if (variant.size or '').strip():
+        bits.append('size ' + variant.size.strip())
+    return ' '.join(b for b in bits if b)
+
+
+def comp_variants(ids=None):
+    """Variants to price: the given ids, or everything waiting in "To List"."""
+    if ids:
+        return Variant.objects.select_related('product').filter(pk__in=ids)
+    return to_list_variants().prefetch_related(None)
+
+
+def suggest_price(median):
+    """Just under the median of comparable listings, e.g. 23.40 -> 22.99."""
+    if median is None:
+        return None
+    if median < 1:
+        return median.quantize(CENT)
+    whole = (median + CENT).to_integral_value(rounding=ROUND_FLOOR)
+    return whole - CENT
+
+
+def _money(value):
+    return None if value is None else Decimal(str(value)).quantize(CENT)
+
+
+def _lookup(client, query, limit):
+    try:
+        entry, _ = cached_search(client, query, limit=limit)
+        return entry['stats']
+    finally:
+        # A database cache backend would open a connection on this pool thread
+        connection.close()
+
+
+def price_variants(variants, client, limit=20, workers=None, progress=None) -> CompsResult:
+    """Look up comps for ``variants`` concurrently and store one ``PriceComp`` per variant."""
+    workers = workers or getattr(settings, 'EBAY_COMPS_CONCURRENCY', 8)
+    by_query = {}
+    for v in variants.iterator(chunk_size=BATCH_SIZE):
+        query = comp_query(v)
+        if query:
+            by_query.setdefault(normalize_query(query), (query, []))[1].append(v.pk)
+    result = CompsResult(queries=len(by_query))
+    if progress:
+        progress.set_total(sum(len(ids) for _, ids in by_query.values()))
+
+    comps = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='skuportal-comps') as pool:
+        futures = {pool.submit(_lookup, client, query, limit): (query, ids) for query, ids in by_query.values()}
+        for future in as_completed(futures):
+            query, ids = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                logger.warning('eBay comps for %r failed: %s', query, e)
+                result.failed += len(ids)
+            else:
+                now = timezone.now()
+                median = _money(stats['median'])
+                for pk in ids:
+                    comps.append(PriceComp(
+                        variant_id=pk, query=query[:255], count=stats['count'], median=median,
+                        average=_money(stats['avg']), suggested_price=suggest_price(median), fetched_at=now,
+                    ))
+                result.priced += len(ids)
+            if progress:
+                progress.advance(len(ids))
+
+    for i in range(0, len(comps), BATCH_SIZE):
+        PriceComp.objects.bulk_create(
+            comps[i:i + BATCH_SIZE],
+            update_conflicts=True,
+            unique_fields=['variant'],
+            update_fields=['query', 'count', 'median', 'average', 'suggested_price', 'fetched_at'],
+        )
+    return result
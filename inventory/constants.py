@@ -19,3 +19,10 @@ CONDITIONS = [
 STATUSES = [
     'Draft', 'To Photograph', 'To List', 'Listed', 'Reserved', 'Sold', 'Returned', 'Donated'
 ]
+
+# Longest edge (px) for photos resized in the "To List" ZIP (?resize=<key>).
+# Adjust to each marketplace's current photo guidance.
+EXPORT_IMAGE_MAX_EDGES = {
+    'vinted': 1600,
+    'ebay': 1600,
+}
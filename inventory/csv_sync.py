@@ -1,71 +1,197 @@
+"""Incremental CSV snapshot of all variants (``media/private/inventory.csv``).
+
+The snapshot is kept as segment files of ``SEGMENT_SIZE`` consecutive
+variant ids under ``inventory.csv.d/``.  Signals mark changed variant (or
+product) ids dirty; a single long-lived writer thread debounces the marks,
+re-reads only the dirty segments from the database and then stitches the
+segments into ``inventory.csv``.  Every file is replaced atomically.
+"""
 import csv
+import json
+import logging
 import os
+import shutil
 import threading
 from pathlib import Path
 from django.conf import settings
+from django.db import connection, transaction
+from .exports import EXPORT_FIELDS, EXPORT_HEADERS, format_csv_row, iter_rows
 from .models import Variant
 
-_lock = threading.Lock()
-_timer = None
+logger = logging.getLogger(__name__)
+
+SEGMENT_SIZE = 1000
 _DELAY_SEC = 1.0
 
+_lock = threading.Lock()        # guards the pending marks and the writer thread
+_write_lock = threading.Lock()  # one snapshot write at a time
+_wake = threading.Event()
+_writer = None
+_pending_variants = set()
+_pending_products = set()
+_pending_full = False
 
-def _csv_path() -> Path:
+
+def _private_dir() -> Path:
     # Store under MEDIA_ROOT/private so it is never collected as static
     base = Path(settings.MEDIA_ROOT) / 'private'
     base.mkdir(parents=True, exist_ok=True)
-    return base / 'inventory.csv'
+    return base
 
 
-def write_csv_snapshot():
-    """Write a full CSV snapshot of all variants atomically."""
-    path = _csv_path()
-    tmp_path = path.with_suffix('.csv.tmp')
-    path.parent.mkdir(parents=True, exist_ok=True)
+def _csv_path() -> Path:
+    return _private_dir() / 'inventory.csv'
+
+
+def _segments_dir() -> Path:
+    path = _private_dir() / 'inventory.csv.d'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
 
+
+def _segment_of(pk) -> int:
+    return (pk - 1) // SEGMENT_SIZE
+
+
+def _segment_path(n) -> Path:
+    return _segments_dir() / f'{n:06d}.csv'
+
+
+def _replace(path, rows):
+    """Atomically replace ``path`` with the given CSV rows."""
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')  # one per server process
     with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
         writer = csv.writer(f)
-        writer.writerow([
-            'Main SKU','Variant SKU','Product Name','Brand','Category','Size','Condition','Colour',
-            'Date','Cost','Price','Fees','Net','Profit','Margin','Qty','Location','Status'
-        ])
-        for v in Variant.objects.select_related('product').all():
-            writer.writerow([
-                v.product.main_sku,
-                v.variant_sku,
-                v.product.name,
-                v.product.brand,
-                v.product.category,
-                v.size,
-                v.condition,
-                v.colour,
-                v.date.strftime('%d/%m/%Y') if v.date else '',
-                f"{v.cost:.2f}",
-                f"{v.price:.2f}",
-                f"{v.fees:.2f}",
-                f"{v.net:.2f}",
-                f"{v.profit:.2f}",
-                f"{v.margin:.2f}%",
-                v.qty,
-                v.location,
-                v.status,
-            ])
+        for row in rows:
+            writer.writerow(format_csv_row(row))
+    os.replace(tmp_path, path)
+
+
+def _write_segment(n):
+    """Re-read one id range from the database; an empty range drops its file."""
+    lo, hi = n * SEGMENT_SIZE, (n + 1) * SEGMENT_SIZE
+    rows = list(iter_rows(Variant.objects.filter(pk__gt=lo, pk__lte=hi)))
+    path = _segment_path(n)
+    if rows:
+        _replace(path, rows)
+    elif path.exists():
+        path.unlink()
+
+
+def _write_all_segments():
+    """Rebuild every segment in one ordered pass over the table."""
+    written = set()
+    current, buffer = None, []
+    rows = Variant.objects.order_by('id').values_list('id', *EXPORT_FIELDS).iterator(chunk_size=SEGMENT_SIZE)
+    for pk, *row in rows:
+        n = _segment_of(pk)
+        if n != current and buffer:
+            _replace(_segment_path(current), buffer)
+            written.add(current)
+            buffer = []
+        current = n
+        buffer.append(row)
+    if buffer:
+        _replace(_segment_path(current), buffer)
+        written.add(current)
+    for path in _segments_dir().glob('*.csv'):
+        if int(path.stem) not in written:
+            path.unlink()
+    (_segments_dir() / 'index.json').write_text(json.dumps({'segment_size': SEGMENT_SIZE}))
+
+
+def _index_ok() -> bool:
+    try:
+        index = json.loads((_segments_dir() / 'index.json').read_text())
+    except (OSError, ValueError):
+        return False
+    return index.get('segment_size') == SEGMENT_SIZE and _csv_path().exists()
+
+
+def _assemble():
+    """Concatenate the header and all segments into ``inventory.csv``."""
+    path = _csv_path()
+    tmp_path = path.with_suffix(f'.csv.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as out:
+        csv.writer(out).writerow(EXPORT_HEADERS)
+        for seg in sorted(_segments_dir().glob('*.csv')):
+            with open(seg, 'r', encoding='utf-8', newline='') as f:
+                shutil.copyfileobj(f, out)
     # Atomic replace
     os.replace(tmp_path, path)
 
 
-def schedule_csv_sync():
-    """Debounce CSV writes to avoid frequent disk I/O during bulk edits."""
-    global _timer
+def sync(variant_ids=(), product_ids=(), full=False):
+    """Bring the snapshot up to date for the given changes.
+
+    Only the segments containing ``variant_ids`` (and the variants of
+    ``product_ids``) are re-read.  A full rebuild happens when asked for or
+    when no usable snapshot exists yet.
+    """
+    with _write_lock:
+        if full or not _index_ok():
+            _write_all_segments()
+        else:
+            ids = set(variant_ids)
+            product_ids = list(product_ids)
+            for i in range(0, len(product_ids), 500):
+                ids.update(Variant.objects.filter(product_id__in=product_ids[i:i + 500]).values_list('pk', flat=True))
+            if not ids:
+                return
+            for n in sorted({_segment_of(pk) for pk in ids}):
+                _write_segment(n)
+        _assemble()
+
+
+def write_csv_snapshot():
+    """Write a full CSV snapshot of all variants atomically."""
+    sync(full=True)
+
+
+def _run_writer():
+    global _pending_full
+    while True:
+        _wake.wait()
+        # Debounce: keep waiting while marks keep arriving
+        while True:
+            _wake.clear()
+            if not _wake.wait(_DELAY_SEC):
+                break
+        with _lock:
+            variant_ids, product_ids, full = set(_pending_variants), set(_pending_products), _pending_full
+            _pending_variants.clear()
+            _pending_products.clear()
+            _pending_full = False
+        try:
+            sync(variant_ids, product_ids, full)
+        except Exception:
+            logger.exception('CSV snapshot sync failed')
+        finally:
+            # The writer thread lives forever; do not hold a connection between runs
+            connection.close()
+
+
+def _mark(variant_ids, product_ids, full):
+    global _writer, _pending_full
+    with _lock:
+        _pending_variants.update(variant_ids)
+        _pending_products.update(product_ids)
+        _pending_full = _pending_full or full
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_run_writer, name='csv-sync', daemon=True)
+            _writer.start()
+    _wake.set()
+
+
+def schedule_csv_sync(variant_ids=(), product_ids=(), full=False):
+    """Mark variants/products as changed; the writer thread picks them up shortly.
+
+    Marks are applied once the current transaction commits, so the writer
+    never reads rows that might still roll back.  Calling it without
+    arguments just nudges the writer to flush anything already pending.
+    """
     # Allow disabling in production via settings
     if not getattr(settings, 'CSV_SYNC_ENABLED', True):
         return
-    with _lock:
-        if _timer is not None:
-            try:
-                _timer.cancel()
-            except Exception:
-                pass
-        _timer = threading.Timer(_DELAY_SEC, write_csv_snapshot)
-        _timer.daemon = True
-        _timer.start()
+    variant_ids, product_ids = list(variant_ids), list(product_ids)
+    transaction.on_commit(lambda: _mark(variant_ids, product_ids, full))
@@ -1,14 +1,47 @@
+import hashlib
+import json
+import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple
 try:
     import requests  # optional dependency; only needed if eBay is enabled
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 except Exception:  # pragma: no cover
     requests = None
 from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+if requests is not None:
+    class _Retry(Retry):
+        """urllib3 retry that honours ``Retry-After`` but never sleeps past ``retry_after_max``."""
+
+        retry_after_max = 30
+
+        def get_retry_after(self, response):
+            seconds = super().get_retry_after(response)
+            return None if seconds is None else min(seconds, self.retry_after_max)
 
 
 class EbayClient:
-    """Minimal eBay Browse API client using application access token (client credentials)."""
+    """Minimal eBay Browse API client using application access token (client credentials).
+
+    Calls go through one pooled ``requests.Session`` that retries 429/5xx
+    responses and connection errors with exponential backoff (honouring
+    ``Retry-After``).  ``metrics()`` reports call counts and latency.
+    """
 
     def __init__(self,
                  client_id: str,
@@ -16,57 +49,137 @@ class EbayClient:
                  marketplace_id: str = 'EBAY_GB',
                  env: str = 'production',
                  scope: str = 'https://api.ebay.com/oauth/api_scope/buy.browse.readonly',
-                 timeout: int = 10):
+                 timeout: int = 10,
+                 api_base: str = '',
+                 retries: int = 3,
+                 pool_size: int = 10):
         self.client_id = client_id
         self.client_secret = client_secret
         self.marketplace_id = marketplace_id
         self.env = env
         self.scope = scope
         self.timeout = timeout
+        self.api_base = api_base.rstrip('/')
+        self.retries = retries
+        self.pool_size = pool_size
         self._token: Optional[str] = None
         self._token_expiry: float = 0.0
+        self._token_lock = threading.Lock()
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'requests': 0, 'errors': 0, 'retries': 0, 'token_refreshes': 0,
+            'latency_total_ms': 0.0, 'latency_max_ms': 0.0, 'latency_last_ms': 0.0,
+        }
 
     @property
     def base_oauth_url(self) -> str:
+        if self.api_base:
+            return f'{self.api_base}/identity/v1/oauth2/token'
         return 'https://api.ebay.com/identity/v1/oauth2/token' if self.env == 'production' else 'https://api.sandbox.ebay.com/identity/v1/oauth2/token'
 
     @property
     def base_browse_url(self) -> str:
+        if self.api_base:
+            return f'{self.api_base}/buy/browse/v1'
         return 'https://api.ebay.com/buy/browse/v1' if self.env == 'production' else 'https://api.sandbox.ebay.com/buy/browse/v1'
 
-    def _ensure_token(self) -> str:
+    @property
+    def session(self):
         if requests is None:
             raise RuntimeError('requests is not installed. Install it or disable eBay integration (EBAY_ENABLED=0).')
-        now = time.time()
-        if self._token and now < (self._token_expiry - 30):  # refresh a bit early
-            return self._token
+        with self._session_lock:
+            if self._session is None:
+                retry = _Retry(
+                    total=self.retries,
+                    backoff_factor=0.5,  # 0.5s, 1s, 2s, ...
+                    backoff_max=10,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=frozenset({'GET', 'POST'}),
+                    respect_retry_after_header=True,
+                    raise_on_status=False,  # hand back the last response; raise_for_status reports it
+                )
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size, max_retries=retry)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
 
-        data = {
-            'grant_type': 'client_credentials',
-            'scope': self.scope,
-        }
-        resp = requests.post(
-            self.base_oauth_url,
-            auth=(self.client_id, self.client_secret),
-            data=data,
-            headers={'Content-Type': 'application/x-www-form-urlencoded'},
-            timeout=self.timeout,
-        )
-        resp.raise_for_status()
-        tok = resp.json()
-        self._token = tok['access_token']
-        self._token_expiry = now + int(tok.get('expires_in', 7200))
-        return self._token
+    def _request(self, method: str, url: str, **kwargs):
+        started = time.monotonic()
+        retries = 0
+        try:
+            resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            history = getattr(resp.raw, 'retries', None)
+            retries = len(history.history) if history else 0
+            resp.raise_for_status()
+        except Exception:
+            self._record(started, retries, error=True)
+            raise
+        self._record(started, retries)
+        return resp
+
+    def _record(self, started: float, retries: int, error: bool = False) -> None:
+        elapsed = (time.monotonic() - started) * 1000
+        with self._metrics_lock:
+            m = self._metrics
+            m['requests'] += 1
+            m['retries'] += retries
+            m['errors'] += int(error)
+            m['latency_total_ms'] += elapsed
+            m['latency_last_ms'] = elapsed
+            m['latency_max_ms'] = max(m['latency_max_ms'], elapsed)
+        if retries:
+            logger.warning('eBay call needed %d retries (%.0f ms)', retries, elapsed)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of call counters and latency since the client was created."""
+        with self._metrics_lock:
+            m = dict(self._metrics)
+        m['latency_avg_ms'] = round(m['latency_total_ms'] / m['requests'], 1) if m['requests'] else None
+        for key in ('latency_total_ms', 'latency_max_ms', 'latency_last_ms'):
+            m[key] = round(m[key], 1)
+        return m
+
+    def _token_valid(self) -> bool:
+        return bool(self._token) and time.time() < (self._token_expiry - 30)  # refresh a bit early
+
+    def _ensure_token(self) -> str:
+        if self._token_valid():
+            return self._token
+        # Single flight: concurrent callers wait for one refresh instead of each fetching a token
+        with self._token_lock:
+            if self._token_valid():
+                return self._token
+            now = time.time()
+            data = {
+                'grant_type': 'client_credentials',
+                'scope': self.scope,
+            }
+            resp = self._request(
+                'POST',
+                self.base_oauth_url,
+                auth=(self.client_id, self.client_secret),
+                data=data,
+                headers={'Content-Type': 'application/x-www-form-urlencoded'},
+            )
+            tok = resp.json()
+            self._token_expiry = now + int(tok.get('expires_in', 7200))
+            self._token = tok['access_token']
+            with self._metrics_lock:
+                self._metrics['token_refreshes'] += 1
+            return self._token
 
     def search(self, q: str, limit: int = 10, filters: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
-        if requests is None:
-            raise RuntimeError('requests is not installed. Install it or disable eBay integration (EBAY_ENABLED=0).')
         token = self._ensure_token()
         params: Dict[str, Any] = {'q': q, 'limit': max(1, min(limit, 50))}
         if filters:
             params.update(filters)
         url = f"{self.base_browse_url}/item_summary/search"
-        resp = requests.get(
+        resp = self._request(
+            'GET',
             url,
             params=params,
             headers={
@@ -74,9 +187,7 @@ class EbayClient:
                 'X-EBAY-C-MARKETPLACE-ID': self.marketplace_id,
                 'Accept-Language': 'en-GB',
             },
-            timeout=self.timeout,
         )
-        resp.raise_for_status()
         return resp.json()
 
     @staticmethod
@@ -99,16 +210,105 @@ class EbayClient:
         }
 
 
+def _settings_key() -> Tuple:
+    return (
+        settings.EBAY_CLIENT_ID,
+        settings.EBAY_CLIENT_SECRET,
+        settings.EBAY_MARKETPLACE_ID,
+        settings.EBAY_ENV,
+        settings.EBAY_SCOPE,
+        getattr(settings, 'EBAY_TIMEOUT', 10),
+        getattr(settings, 'EBAY_API_BASE', ''),
+        getattr(settings, 'EBAY_RETRIES', 3),
+        getattr(settings, 'EBAY_POOL_SIZE', 10),
+    )
+
+
 def get_client() -> Optional[EbayClient]:
+    """The process-wide client, so its access token is reused across requests."""
+    global _client, _client_key
     if not getattr(settings, 'EBAY_ENABLED', False):
         return None
     if not settings.EBAY_CLIENT_ID or not settings.EBAY_CLIENT_SECRET:
         return None
-    return EbayClient(
-        client_id=settings.EBAY_CLIENT_ID,
-        client_secret=settings.EBAY_CLIENT_SECRET,
-        marketplace_id=settings.EBAY_MARKETPLACE_ID,
-        env=settings.EBAY_ENV,
-        scope=settings.EBAY_SCOPE,
-        timeout=getattr(settings, 'EBAY_TIMEOUT', 10),
+    key = _settings_key()
+    with _client_lock:
+        if _client is None or _client_key != key:
+            client_id, client_secret, marketplace_id, env, scope, timeout, api_base, retries, pool_size = key
+            _client = EbayClient(
+                client_id=client_id,
+                client_secret=client_secret,
+                marketplace_id=marketplace_id,
+                env=env,
+                scope=scope,
+                timeout=timeout,
+                api_base=api_base,
+                retries=retries,
+                pool_size=pool_size,
+            )
+            _client_key = key
+        return _client
+
+
+def normalize_query(q: str) -> str:
+    return ' '.join((q or '').lower().split())
+
+
+def search_cache_key(client: EbayClient, q: str, limit: int, filters: Optional[Dict[str, str]] = None) -> str:
+    """Cache key for a search: the same words in any case/spacing share one entry."""
+    raw = json.dumps(
+        [client.env, client.marketplace_id, normalize_query(q), limit, sorted((filters or {}).items())],
+        separators=(',', ':'),
     )
+    return 'ebay:search:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _fetch(client: EbayClient, key: str, q: str, limit: int, filters: Optional[Dict[str, str]]) -> Dict[str, Any]:
+    data = client.search(q=q, limit=limit, filters=filters)
+    entry = {
+        'data': data,
+        'stats': client.summarize_prices(data.get('itemSummaries') or []),
+        'fetched_at': time.time(),
+    }
+    ttl = getattr(settings, 'EBAY_CACHE_TTL', 900)
+    cache.set(key, entry, ttl + getattr(settings, 'EBAY_CACHE_STALE', 86400))
+    return entry
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='skuportal-ebay')
+        return _pool
+
+
+def _revalidate(client, key, q, limit, filters):
+    try:
+        _fetch(client, key, q, limit, filters)
+    except Exception:
+        logger.warning('Refreshing cached eBay search %r failed', q, exc_info=True)
+    finally:
+        cache.delete(key + ':refresh')
+
+
+def cached_search(client: EbayClient, q: str, limit: int = 10,
+                  filters: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, Any], str]:
+    """``client.search`` plus price stats through the cache, as ``(entry, state)``.
+
+    ``entry`` holds ``data`` (the Browse response), ``stats`` and
+    ``fetched_at``.  ``state`` is ``'fresh'`` within ``EBAY_CACHE_TTL``,
+    ``'stale'`` for up to ``EBAY_CACHE_STALE`` seconds after that (the old
+    entry is returned at once and refreshed in the background) and
+    ``'miss'`` when eBay had to be called inline.
+    """
+    key = search_cache_key(client, q, limit, filters)
+    entry = cache.get(key)
+    if entry is None:
+        return _fetch(client, key, q, limit, filters), 'miss'
+    if time.time() - entry['fetched_at'] < getattr(settings, 'EBAY_CACHE_TTL', 900):
+        return entry, 'fresh'
+    # Only one refresh per key at a time, across processes sharing the cache
+    if cache.add(key + ':refresh', 1, client.timeout * 3):
+        _executor().submit(_revalidate, client, key, q, limit, filters)
+    return entry, 'stale'
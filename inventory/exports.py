@@ -0,0 +1,273 @@
+"""Row sources and writers for the CSV/XLSX exports.
+
+Rows are read with ``values_list(...).iterator()`` so the queryset is never
+cached in memory.  The CSV writer yields the body in small buffered chunks
+suitable for ``StreamingHttpResponse``; the XLSX writer uses openpyxl's
+write-only mode into a spooled temporary file served by ``FileResponse``;
+the "To List" ZIP is built the same way in a temp file on disk.
+
+The XLSX and "To List" ZIP writers accept an optional ``progress`` object
+(see ``inventory.jobs.Progress``) so background jobs can report how far
+they have got.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from django.conf import settings
+from django.utils.text import slugify
+from .images import fit_within
+from .models import Variant
+
+EXPORT_HEADERS = [
+    'Main SKU', 'Variant SKU', 'Product Name', 'Brand', 'Category', 'Size', 'Condition', 'Colour',
+    'Date', 'Cost', 'Price', 'Fees', 'Net', 'Profit', 'Margin', 'Qty', 'Location', 'Status',
+]
+
+EXPORT_FIELDS = (
+    'product__main_sku', 'variant_sku', 'product__name', 'product__brand', 'product__category',
+    'size', 'condition', 'colour', 'date', 'cost', 'price', 'fees', 'net', 'profit', 'margin',
+    'qty', 'location', 'status',
+)
+
+CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# Exports smaller than this stay in memory; larger ones roll over to disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+# Variants (with their images prefetched) loaded at a time for the ZIP
+ZIP_CHUNK_SIZE = 200
+# Image formats that are already compressed; deflating them again only costs CPU
+STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.heic'}
+
+
+def iter_rows(variants, chunk_size=CHUNK_SIZE):
+    """Yield raw export tuples in id order without caching the queryset."""
+    return variants.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def format_csv_row(row):
+    (main_sku, variant_sku, name, brand, category, size, condition, colour,
+     date, cost, price, fees, net, profit, margin, qty, location, status) = row
+    return [
+        main_sku, variant_sku, name, brand, category, size, condition, colour,
+        date.strftime('%d/%m/%Y') if date else '',
+        f"{cost:.2f}", f"{price:.2f}", f"{fees:.2f}", f"{net:.2f}", f"{profit:.2f}", f"{margin:.2f}%",
+        qty, location, status,
+    ]
+
+
+def stream_csv(variants, chunk_size=CHUNK_SIZE):
+    """Yield the CSV export as text chunks of ``ROWS_PER_WRITE`` rows each."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_HEADERS)
+    # Send the header straight away so the download starts immediately
+    yield buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    pending = 0
+    for row in iter_rows(variants, chunk_size):
+        writer.writerow(format_csv_row(row))
+        pending += 1
+        if pending >= ROWS_PER_WRITE:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+    yield buf.getvalue()
+
+
+def format_xlsx_row(row):
+    """Like :func:`format_csv_row` but money stays numeric (Decimals are written as-is)."""
+    (main_sku, variant_sku, name, brand, category, size, condition, colour,
+     date, cost, price, fees, net, profit, margin, qty, location, status) = row
+    return [
+        main_sku, variant_sku, name, brand, category, size, condition, colour,
+        date.strftime('%d/%m/%Y') if date else '',
+        cost, price, fees, net, profit, f"{margin:.2f}%",
+        qty, location, status,
+    ]
+
+
+def write_xlsx(variants, fileobj, chunk_size=CHUNK_SIZE, progress=None):
+    """Write the XLSX export to ``fileobj`` with bounded memory."""
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title='Products')
+    ws.append(EXPORT_HEADERS)
+    if progress:
+        progress.set_total(variants.count())
+    for row in iter_rows(variants, chunk_size):
+        ws.append(format_xlsx_row(row))
+        if progress:
+            progress.advance()
+    wb.save(fileobj)
+
+
+def xlsx_tempfile(variants):
+    """Build the XLSX export in a spooled temp file, rewound and ready to serve."""
+    tmp = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    write_xlsx(variants, tmp)
+    tmp.seek(0)
+    return tmp
+
+
+def to_list_variants():
+    """Active variants waiting to be listed, with everything the ZIP needs."""
+    return Variant.objects.select_related('product').prefetch_related('images').filter(
+        status='To List', product__archived=False,
+    )
+
+
+def _variant_photos(v, max_edge=None):
+    """``(v, [(idx, ext, path, data)])`` for a variant's photos.
+
+    With ``max_edge`` each photo is resized and ``data`` holds the JPEG
+    bytes; otherwise (or when the photo already fits) ``data`` is ``None``
+    and the original file at ``path`` is copied.
+    """
+    photos = []
+    for idx, img in enumerate(v.images.all(), start=1):
+        try:
+            path = img.image.path
+        except Exception:
+            continue
+        data = None
+        if max_edge:
+            try:
+                data = fit_within(path, max_edge)
+            except FileNotFoundError:
+                continue
+            except Exception:
+                data = None  # not something Pillow can read; ship it untouched
+        ext = '.jpg' if data is not None else (os.path.splitext(path)[1] or '.jpg')
+        photos.append((idx, ext, path, data))
+    return v, photos
+
+
+def _ordered_map(fn, items, workers):
+    """``map(fn, items)`` on a thread pool, yielding results in input order.
+
+    At most ``2 * workers`` items are in flight, so memory stays bounded
+    however long ``items`` is.  ``items`` is consumed on the calling thread.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='skuportal-zip') as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_to_list_zip(variants, fileobj, progress=None, max_edge=None, workers=None):
+    """Write the "To List" bundle: one folder per variant plus a root manifest.
+
+    ``max_edge`` resizes every photo so its longest side fits; the resizing
+    runs on a bounded thread pool (``workers``, default ``EXPORT_IMAGE_WORKERS``)
+    while this thread writes the archive in variant order.
+    """
+    if progress:
+        progress.set_total(variants.count())
+    rows = variants.iterator(chunk_size=ZIP_CHUNK_SIZE)
+    if max_edge:
+        workers = workers or getattr(settings, 'EXPORT_IMAGE_WORKERS', None) or os.cpu_count() or 1
+        prepared = _ordered_map(partial(_variant_photos, max_edge=max_edge), rows, workers)
+    else:
+        prepared = (_variant_photos(v) for v in rows)
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        # Root manifest for marketplaces that support CSV import
+        manifest_io = io.StringIO()
+        writer = csv.DictWriter(manifest_io, fieldnames=[
+            'main_sku','variant_sku','name','brand','category','size','colour','condition','price','qty','location','date','images'
+        ])
+        writer.writeheader()
+
+        for v, photos in prepared:
+            p = v.product
+            folder_name = f"{(v.variant_sku or p.main_sku) or 'SKU'}-{slugify(p.name) or 'item'}"
+            base = f"{folder_name}/"
+
+            # Description text (simple, editable after export)
+            desc_parts = [
+                f"{p.brand} {p.name}".strip(),
+                f"Category: {p.category}",
+                f"Size: {v.size}" if v.size else None,
+                f"Colour: {v.colour}" if v.colour else None,
+                f"Condition: {v.condition}" if v.condition else None,
+                f"SKU: {v.variant_sku or p.main_sku}",
+            ]
+            description = "\n".join([s for s in desc_parts if s])
+
+            meta = {
+                'product_name': p.name,
+                'brand': p.brand,
+                'category': p.category,
+                'main_sku': p.main_sku,
+                'variant_sku': v.variant_sku,
+                'size': v.size,
+                'colour': v.colour,
+                'condition': v.condition,
+                'qty': v.qty,
+                'price': float(v.price or 0),
+                'cost': float(v.cost or 0),
+                'location': v.location,
+                'date': v.date.strftime('%Y-%m-%d') if v.date else '',
+                'status': v.status,
+            }
+
+            # Per-item files
+            zf.writestr(base + 'product.json', json.dumps(meta, indent=2))
+            zf.writestr(base + 'description.txt', description)
+
+            # Images folder
+            img_count = 0
+            for idx, ext, path, data in photos:
+                name = f"{base}images/{idx:02d}{ext}"
+                if data is not None:
+                    zf.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+                    img_count += 1
+                    continue
+                # zf.write copies the file in chunks; JPEG/PNG are already compressed
+                compress = zipfile.ZIP_STORED if ext.lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                try:
+                    zf.write(path, name, compress_type=compress)
+                    img_count += 1
+                except FileNotFoundError:
+                    continue
+
+            # Manifest row
+            writer.writerow({
+                'main_sku': p.main_sku,
+                'variant_sku': v.variant_sku,
+                'name': p.name,
+                'brand': p.brand,
+                'category': p.category,
+                'size': v.size,
+                'colour': v.colour,
+                'condition': v.condition,
+                'price': f"{v.price:.2f}",
+                'qty': v.qty,
+                'location': v.location,
+                'date': v.date.strftime('%Y-%m-%d') if v.date else '',
+                'images': img_count,
+            })
+            if progress:
+                progress.advance()
+
+        zf.writestr('manifest.csv', manifest_io.getvalue())
+
+
+def to_list_zip_tempfile(variants, max_edge=None):
+    """Build the "To List" ZIP in an unnamed temp file on disk, rewound and ready to serve."""
+    tmp = tempfile.TemporaryFile()
+    write_to_list_zip(variants, tmp, max_edge=max_edge)
+    tmp.seek(0)
+    return tmp
@@ -0,0 +1,38 @@
+"""Product/variant filters shared by the dashboard, the exports and background jobs."""
+from .constants import STATUSES
+from .models import Product, Variant
+from . import search
+
+
+def filter_products(products_qs, q, status, cat, archived_flag):
+    """Apply the dashboard search/status/category/archived filters."""
+    if q:
+        products_qs = search.search_products(products_qs, q)
+    if status and status in STATUSES:
+        products_qs = products_qs.filter(variants__status=status)
+    if cat:
+        products_qs = products_qs.filter(category=cat)
+    # Archived filter: archived=1 shows ONLY archived; default shows ONLY active
+    if archived_flag:
+        products_qs = products_qs.filter(archived=True)
+    else:
+        products_qs = products_qs.filter(archived=False)
+    return products_qs
+
+
+def export_variants(filters=None, archived_flag=False):
+    """Variants to export; ``filters`` is a dict of dashboard filter values.
+
+    Without filters every variant is exported.
+    """
+    variants = Variant.objects.all()
+    if filters is None:
+        return variants
+    products = filter_products(
+        Product.objects.all(), filters.get('q', ''), '', filters.get('cat', ''), archived_flag,
+    )
+    variants = variants.filter(product__in=products.values('pk'))
+    status = filters.get('status', '')
+    if status and status in STATUSES:
+        variants = variants.filter(status=status)
+    return variants
@@ -0,0 +1,75 @@
+"""Derived money fields (fees, net, profit, margin) for variants."""
+from decimal import Decimal
+from django.db.models import Case, DecimalField, F, FloatField, Q, Value, When
+from django.db.models.functions import Abs, Cast, Round
+from django.db.models.lookups import GreaterThan, LessThan
+from .constants import VINTED_FEE_PERCENT, VINTED_FIXED_FEE
+
+CENT = Decimal('0.01')
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+MAX_MONEY = Decimal('99999999.99')  # the largest amount a MONEY column holds
+PERCENT = DecimalField(max_digits=5, decimal_places=2)
+
+
+def auto_fees(price):
+    """Platform fees for ``price``: fixed fee plus a percentage of the price."""
+    return (price * Decimal(VINTED_FEE_PERCENT)) + Decimal(VINTED_FIXED_FEE)
+
+
+def compute_financials(price, fees, cost):
+    """Return ``(fees, net, profit, margin)`` following the ``Variant.save`` rules.
+
+    Fees left empty or zero are auto-calculated; net, profit and margin are
+    only derived when both price and fees are known (``None`` otherwise).
+    """
+    if price is not None and (fees is None or fees == 0):
+        try:
+            fees = auto_fees(price)
+        except Exception:
+            # As a fallback do nothing; user can supply fees manually
+            pass
+    if price is None or fees is None:
+        return fees, None, None, None
+    net = price - fees
+    profit = net - (cost or 0)
+    margin = (profit / price * 100) if price else 0
+    return fees, net, profit, margin
+
+
+def money(expression):
+    """``expression`` rounded to the penny."""
+    return Round(expression, 2, output_field=MONEY)
+
+
+def auto_fees_expression(price, percent=VINTED_FEE_PERCENT, fixed=VINTED_FIXED_FEE):
+    """:func:`auto_fees` as an SQL expression over the ``price`` expression."""
+    return price * Value(Decimal(percent)) + Value(Decimal(fixed))
+
+
+def auto_fees_condition(percent=VINTED_FEE_PERCENT, fixed=VINTED_FIXED_FEE):
+    """Rows whose stored fees were auto-calculated: zero, or the auto fees of the stored price.
+
+    Stored fees are rounded to the penny, so "equal" means within one.
+    """
+    return Q(fees=0) | Q(LessThan(Abs(F('fees') - auto_fees_expression(F('price'), percent, fixed)), Value(CENT)))
+
+
+def financial_updates(price, auto=None):
+    """``.update()`` values recomputing fees, net, profit and margin for a new ``price``.
+
+    ``price`` is an expression and may refer to the row's current price: every
+    right-hand side of an UPDATE sees the old row.  Rows matching ``auto``
+    (by default :func:`auto_fees_condition`) get the auto fees of the new
+    price; other rows keep the fees typed in by hand, as ``Variant.save`` does.
+    """
+    if auto is None:
+        auto = auto_fees_condition()
+    fees = Case(When(auto, then=money(auto_fees_expression(price))), default=F('fees'), output_field=MONEY)
+    profit = price - fees - F('cost')
+    # Through floats: SQLite stores whole-pound amounts as integers and would integer-divide
+    ratio = Cast(profit, FloatField()) * Value(100.0) / Cast(price, FloatField())
+    margin = Case(
+        When(GreaterThan(price, Value(Decimal(0))), then=Round(Cast(ratio, PERCENT), 2)),
+        default=Value(Decimal(0)), output_field=PERCENT,
+    )
+    return {'price': price, 'fees': fees, 'net': price - fees, 'profit': profit, 'margin': margin}
@@ -18,6 +18,8 @@ class ProductForm(forms.ModelForm):
         # Main SKU optional and normalized
         self.fields['main_sku'].required = False
         self.fields['main_sku'].help_text = 'Optional. Leave blank to auto-generate (e.g., 001).'
+        # Suggestions from inventory.vocab (datalists rendered by the templates)
+        self.fields['brand'].widget.attrs.update({'list': 'brandsList', 'autocomplete': 'off'})
 
     def clean_main_sku(self):
         sku = (self.cleaned_data.get('main_sku') or '').strip()
@@ -46,6 +48,8 @@ class VariantForm(forms.ModelForm):
         # Variant SKU optional, normalized
         self.fields['variant_sku'].required = False
         self.fields['variant_sku'].help_text = 'Optional. Leave blank to auto-generate (e.g., HOOD-XL-001).'
+        self.fields['colour'].widget.attrs.update({'list': 'coloursList', 'autocomplete': 'off'})
+        self.fields['location'].widget.attrs.update({'list': 'locationsList', 'autocomplete': 'off'})
         # Make most fields optional to ease quick add; rely on model defaults
         for fname in ['size','condition','colour','date','cost','price','qty','location','status']:
             if fname in self.fields:
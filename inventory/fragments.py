@@ -0,0 +1,79 @@
+"""Version stamps for the cached dashboard and storefront card fragments.
+
+Cards are cached with ``{% cache %}`` keyed on the object's id and its
+``updated_at`` stamp, so a changed row simply renders under a new key and
+the old entry ages out.  Because the stamp lives in the database, every
+server process sees the same version whatever cache backend is used.
+
+``updated_at`` moves on ``save()`` (``auto_now``); the model signals and the
+bulk paths that write with queryset ``.update()`` call :func:`touch_products`
+/ :func:`touch_variants` so a card also moves when something it shows (a
+variant chip, a photo, the product name) changes on a related row.
+
+Cards never contain ``{% csrf_token %}`` forms; those stay outside the
+cached blocks.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+from .models import Product, Variant
+
+TTL = 60 * 60 * 24
+
+_CHUNK = 500
+
+
+def _chunks(ids):
+    ids = [pk for pk in {*ids} if pk is not None]
+    for i in range(0, len(ids), _CHUNK):
+        yield ids[i:i + _CHUNK]
+
+
+def touch_products(product_ids, variants=True):
+    """Move the stamp of products (and, by default, of their variants)."""
+    now = timezone.now()
+    for chunk in _chunks(product_ids):
+        Product.objects.filter(pk__in=chunk).update(updated_at=now)
+        if variants:
+            Variant.objects.filter(product_id__in=chunk).update(updated_at=now)
+
+
+def touch_variants(variant_ids, products=True):
+    """Move the stamp of variants (and, by default, of their products)."""
+    now = timezone.now()
+    for chunk in _chunks(variant_ids):
+        Variant.objects.filter(pk__in=chunk).update(updated_at=now)
+        if products:
+            Product.objects.filter(variants__in=chunk).update(updated_at=now)
+
+
+def _cache():
+    # Same lookup as the {% cache %} tag
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def key(fragment_name, obj):
+    return make_template_fragment_key(fragment_name, [obj.pk, obj.updated_at])
+
+
+def uncached(objects, *fragment_names):
+    """The objects missing any of the named fragments from the cache, in one ``get_many``.
+
+    Views prefetch related rows for just these; cached cards never touch them.
+    """
+    keys = {(name, obj.pk): key(name, obj) for obj in objects for name in fragment_names}
+    found = _cache().get_many(list(keys.values()))
+    return [
+        obj for obj in objects
+        if any(keys[(name, obj.pk)] not in found for name in fragment_names)
+    ]
+
+
+def prefetch_uncached(objects, fragment_names, *lookups):
+    """``prefetch_related_objects`` for just the objects whose cards must render."""
+    prefetch_related_objects(uncached(objects, *fragment_names), *lookups)
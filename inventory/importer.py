@@ -0,0 +1,273 @@
+"""Batched CSV/XLSX import pipeline.
+
+Rows are parsed up front, existing main and variant SKUs are pre-loaded
+into dicts, and all writes happen through ``bulk_create``/``bulk_update`` in
+chunks inside a single transaction.  Bulk writes bypass the per-row model
+signals, so the search index, KPI rollup and CSV snapshot are refreshed
+once for the whole batch at the end.
+"""
+import csv
+import io
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from .csv_sync import schedule_csv_sync
+from .finance import compute_financials
+from .models import Product, SkuSequence, Variant, reserve_main_skus
+from . import fragments, rollups, search, stats, vocab
+
+BATCH_SIZE = 500
+
+VARIANT_FIELDS = [
+    'size', 'condition', 'colour', 'qty', 'location', 'status', 'date',
+    'cost', 'price', 'fees', 'net', 'profit', 'margin',
+]
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+
+    @property
+    def imported(self):
+        return self.created + self.updated
+
+
+def _normalize(row):
+    # Normalize header keys: trim whitespace
+    norm = {}
+    for k, v in row.items():
+        kk = (k or '')
+        if isinstance(kk, str):
+            kk = kk.strip()
+        norm[kk] = v
+    return norm
+
+
+def _get_val(row, keys, default=''):
+    # Accept flexible headers and synonyms
+    for k in keys:
+        if k in row and row.get(k) is not None:
+            v = row.get(k)
+            return v.strip() if isinstance(v, str) else v
+    return default
+
+
+def parse_money(val):
+    if val is None:
+        return Decimal('0')
+    s = str(val).replace('£', '').strip()
+    try:
+        return Decimal(s or 0)
+    except InvalidOperation:
+        return Decimal('0')
+
+
+def parse_date(val):
+    if not val:
+        return datetime.now().date()
+    if isinstance(val, datetime):
+        return val.date()
+    for fmt in ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(str(val), fmt).date()
+        except ValueError:
+            pass
+    return datetime.now().date()
+
+
+def parse_row(row):
+    """Turn one input row into a plain dict of product/variant values, or None to skip."""
+    row = _normalize(row)
+    name = (_get_val(row, ['Product Name', 'Title', 'Name'], '') or '').strip()
+    if not name:
+        return None
+    # Optional main SKU handling (support Master/Main); zero-pad numeric
+    main_sku = str(_get_val(row, ['Main SKU', 'Master SKU'], '') or '').strip()
+    if main_sku.isdigit():
+        main_sku = f"{int(main_sku):03d}"
+    try:
+        qty = int(_get_val(row, ['Qty', 'Quantity'], 1) or 1)
+    except (TypeError, ValueError):
+        qty = 1
+    cost = parse_money(_get_val(row, ['Cost', 'Purchase Price', 'Buy Price']))
+    price = parse_money(_get_val(row, ['Price', 'Listed Price', 'Sale Price']))
+    fees, net, profit, margin = compute_financials(
+        price, parse_money(_get_val(row, ['Fees', 'Estimated Fees', 'Platform Fees'])), cost,
+    )
+    return {
+        'name': name,
+        'brand': (_get_val(row, ['Brand'], '') or ''),
+        'category': (_get_val(row, ['Category'], 'Clothing') or 'Clothing'),
+        'main_sku': main_sku,
+        'variant_sku': str(_get_val(row, ['Variant SKU', 'SKU Variant'], '') or '').strip(),
+        'variant': {
+            'size': str(_get_val(row, ['Size'], '') or '')[:40],
+            'condition': (_get_val(row, ['Condition'], 'Good') or 'Good'),
+            'colour': (_get_val(row, ['Colour', 'Color'], '') or ''),
+            'qty': qty,
+            'location': (_get_val(row, ['Location', 'Location/Bin', 'Bin', 'Shelf'], 'Spare Room') or 'Spare Room'),
+            'status': (_get_val(row, ['Status'], 'Draft') or 'Draft'),
+            'date': parse_date(_get_val(row, ['Date', 'Purchase Date'])),
+            'cost': cost,
+            'price': price,
+            'fees': fees,
+            'net': net,
+            'profit': profit,
+            'margin': margin,
+        },
+    }
+
+
+def read_rows(fileobj, name):
+    """Open an uploaded CSV/XLSX file as ``(row_count, iterator of header->value dicts)``.
+
+    ``row_count`` excludes the header and may be ``None`` when the sheet does
+    not record its dimensions.  Raises ``ValueError`` for other file types.
+    """
+    name = name.lower()
+    if name.endswith('.csv'):
+        decoded = fileobj.read()
+        if isinstance(decoded, bytes):
+            decoded = decoded.decode('utf-8')
+        # Robust delimiter detection based on header column count
+        lines = [ln for ln in decoded.splitlines() if ln.strip()]
+        header = lines[0] if lines else ''
+        candidates = ['\t', ',', ';', '|']
+        best = max(candidates, key=lambda d: len(header.split(d)))
+        if len(header.split(best)) <= 1:
+            best = ','
+        return max(len(lines) - 1, 0), csv.DictReader(io.StringIO(decoded), delimiter=best)
+    if name.endswith('.xlsx'):
+        import openpyxl
+        wb = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+        ws = wb.active
+        rows = ws.iter_rows(values_only=True)
+        headers = list(next(rows, None) or [])
+        total = ws.max_row - 1 if ws.max_row else None
+        return total, (dict(zip(headers, row)) for row in rows)
+    raise ValueError('Unsupported file type. Please upload CSV or XLSX.')
+
+
+def _chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _preload(model, field, values):
+    """Map ``field`` value -> instance for the given values, querying in chunks."""
+    found = {}
+    for chunk in _chunks({v for v in values if v}):
+        for obj in model.objects.filter(**{f'{field}__in': chunk}):
+            found[getattr(obj, field)] = obj
+    return found
+
+
+def ingest_rows(rows, progress=None) -> ImportResult:
+    """Import parsed spreadsheet rows; see the module docstring.
+
+    ``progress`` (optional) is advanced once per input row as it is parsed.
+    """
+    result = ImportResult()
+    records = []
+    for row in rows:
+        rec = parse_row(row)
+        if rec is None:
+            result.skipped += 1
+        else:
+            records.append(rec)
+        if progress:
+            progress.advance()
+    if not records:
+        return result
+
+    products_by_sku = _preload(Product, 'main_sku', (r['main_sku'] for r in records))
+    variants_by_sku = _preload(Variant, 'variant_sku', (r['variant_sku'] for r in records))
+
+    # Resolve products: existing by main SKU, otherwise one new product per
+    # distinct main SKU (or per row when no SKU is given)
+    new_products = []
+    for rec in records:
+        sku = rec['main_sku']
+        product = products_by_sku.get(sku) if sku else None
+        if product is None:
+            product = Product(name=rec['name'], brand=rec['brand'], category=rec['category'], main_sku=sku)
+            new_products.append(product)
+            if sku:
+                products_by_sku[sku] = product
+        rec['product'] = product
+    # Auto SKUs come from one reserved block, after any numeric SKUs in the file
+    numeric = [int(p.main_sku) for p in new_products if p.main_sku.isdigit()]
+    if numeric:
+        SkuSequence.observe(SkuSequence.MAIN_SKU, max(numeric))
+    unnamed = [p for p in new_products if not p.main_sku]
+    if unnamed:
+        for product, sku in zip(unnamed, reserve_main_skus(len(unnamed))):
+            product.main_sku = sku
+
+    # Resolve variants: update by variant SKU, otherwise create
+    to_create, to_update = [], {}
+    for rec in records:
+        variant = variants_by_sku.get(rec['variant_sku']) if rec['variant_sku'] else None
+        if variant is None:
+            variant = Variant(product=rec['product'], variant_sku=rec['variant_sku'])
+            to_create.append(variant)
+            if rec['variant_sku']:
+                variants_by_sku[rec['variant_sku']] = variant
+        elif variant.pk:
+            to_update[variant.pk] = variant
+        for field, value in rec['variant'].items():
+            if value is not None:
+                setattr(variant, field, value)
+
+    # Auto variant SKU: e.g. HOOD-XL-001. Rows whose generated SKU is already
+    # taken (in the database, or earlier in this file) are skipped.
+    generated = set()
+    dupes = set()
+    for variant in to_create:
+        if not variant.variant_sku:
+            p = variant.product
+            sku = f"{(p.category[:4] or 'ITEM').upper()}-{(variant.size or 'NA').upper()}-{p.main_sku}"
+            if sku in generated or sku in variants_by_sku:
+                dupes.add(id(variant))
+            generated.add(sku)
+            variant.variant_sku = sku
+    taken = set(_preload(Variant, 'variant_sku', generated))
+    keep = [v for v in to_create if id(v) not in dupes and v.variant_sku not in taken]
+    result.skipped += len(to_create) - len(keep)
+    to_create = keep
+
+    touched = {v.product_id for v in to_update.values()}
+    touched.update(v.product.pk for v in to_create if v.product.pk)
+    with transaction.atomic():
+        stats.subtract_products(touched)
+        used = {id(v.product) for v in to_create}
+        new_products = [p for p in new_products if id(p) in used]
+        for chunk in _chunks(new_products):
+            Product.objects.bulk_create(chunk)
+        if any(p.pk is None for p in new_products):
+            # Backends that cannot return ids from bulk inserts
+            ids = dict(Product.objects.filter(main_sku__in=[p.main_sku for p in new_products]).values_list('main_sku', 'pk'))
+            for p in new_products:
+                p.pk = ids[p.main_sku]
+        for v in to_create:
+            v.product = v.product  # refresh product_id now that the product has a pk
+        for chunk in _chunks(to_create):
+            Variant.objects.bulk_create(chunk)
+        for chunk in _chunks(to_update.values()):
+            Variant.objects.bulk_update(chunk, VARIANT_FIELDS)
+        touched.update(p.pk for p in new_products)
+        stats.add_products(touched)
+        rollups.refresh(touched)
+    result.created = len(to_create)
+    result.updated = len(to_update)
+
+    search.reindex_products(touched)
+    fragments.touch_products(touched)
+    vocab.invalidate()
+    schedule_csv_sync(product_ids=touched)
+    return result
@@ -0,0 +1,258 @@
+"""Lightweight background jobs backed by the ``Job`` table.
+
+Views enqueue a job and return straight away; the work runs either on a
+small in-process thread pool (``JOBS_RUN_IN_PROCESS``, the default) or in a
+separate ``manage.py run_jobs`` worker.  Status and progress are persisted
+on the job row so any web process can answer the polling endpoint, and
+finished files are written under ``MEDIA_ROOT/private/jobs/<id>/``.
+
+A job records the ``host:pid`` of the process running it.  A web process
+recycled or killed mid-job leaves it ``running``; the next web process to
+serve a request on that host puts it back in the queue and runs the queue
+(:func:`recover`).  Jobs whose process cannot be checked from here (another
+host) are requeued once they have run longer than ``JOBS_STALE_MINUTES``.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .comps import comp_variants, price_variants
+from .ebay import get_client
+from .exports import to_list_variants, write_to_list_zip, write_xlsx
+from .filters import export_variants
+from .importer import ingest_rows, read_rows
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+_pool = None
+_pool_lock = threading.Lock()
+_recovered = False
+
+
+def handler(kind):
+    """Register the function that runs jobs of ``kind``: ``fn(job, progress)``."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+class Progress:
+    """Counts work done for a job and writes it back at most every ``interval`` seconds."""
+
+    def __init__(self, job, interval=0.5):
+        self.job = job
+        self.interval = interval
+        self._flushed_at = 0.0
+
+    def set_total(self, total):
+        self.job.total = total
+        self.flush(force=True)
+
+    def advance(self, n=1):
+        self.job.done += n
+        self.flush()
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._flushed_at < self.interval:
+            return
+        self._flushed_at = now
+        Job.objects.filter(pk=self.job.pk).update(done=self.job.done, total=self.job.total)
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'JOBS_WORKERS', 2), thread_name_prefix='skuportal-job',
+            )
+        return _pool
+
+
+def enqueue(kind, user=None, params=None, upload=None):
+    """Create a queued job and, when running in-process, hand it to the pool after commit."""
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    job = Job.objects.create(kind=kind, created_by=user, params=params or {})
+    if upload is not None:
+        job.upload.save(f"{job.pk}-{Path(upload.name).name}", upload, save=True)
+    if getattr(settings, 'JOBS_RUN_IN_PROCESS', True):
+        transaction.on_commit(lambda: _executor().submit(_run_in_thread, job.pk))
+    return job
+
+
+def claim(pk=None):
+    """Atomically move one queued job (``pk`` or the oldest) to running; ``None`` if there is none."""
+    queued = Job.objects.filter(status=Job.QUEUED)
+    if pk is not None:
+        queued = queued.filter(pk=pk)
+    candidate = queued.order_by('created_at', 'pk').values_list('pk', flat=True).first()
+    if candidate is None:
+        return None
+    # Conditional update: only one worker can win the queued -> running transition
+    claimed = Job.objects.filter(pk=candidate, status=Job.QUEUED).update(
+        status=Job.RUNNING, started_at=timezone.now(), worker=worker_id(),
+    )
+    return Job.objects.get(pk=candidate) if claimed else None
+
+
+def execute(job):
+    """Run a claimed job's handler and record the outcome."""
+    progress = Progress(job)
+    try:
+        HANDLERS[job.kind](job, progress)
+    except Exception as e:
+        logger.exception('Job %s failed', job.pk)
+        job.status = Job.FAILED
+        job.message = str(e) or e.__class__.__name__
+    else:
+        job.status = Job.SUCCEEDED
+    job.finished_at = timezone.now()
+    job.save(update_fields=[
+        'status', 'message', 'done', 'total', 'upload', 'result_path', 'result_name', 'finished_at',
+    ])
+    return job
+
+
+def run_next(pk=None):
+    job = claim(pk)
+    return execute(job) if job else None
+
+
+def _run_in_thread(pk):
+    try:
+        run_next(pk)
+    finally:
+        # Pool threads outlive the request; do not leak their connections
+        connection.close()
+
+
+def result_file(job, filename):
+    """Absolute path for a job's output file; records it on the job for download."""
+    rel = Path('private') / 'jobs' / str(job.pk) / filename
+    path = Path(settings.MEDIA_ROOT) / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    job.result_path = str(rel)
+    job.result_name = filename
+    return path
+
+
+def result_abspath(job):
+    return Path(settings.MEDIA_ROOT) / job.result_path if job.result_path else None
+
+
+@handler(Job.KIND_EXPORT_XLSX)
+def _export_xlsx(job, progress):
+    variants = export_variants(job.params.get('filters'), job.params.get('archived', False))
+    with open(result_file(job, 'products.xlsx'), 'wb') as fh:
+        write_xlsx(variants, fh, progress=progress)
+
+
+@handler(Job.KIND_EXPORT_TO_LIST)
+def _export_to_list_zip(job, progress):
+    with open(result_file(job, 'to-list.zip'), 'wb') as fh:
+        write_to_list_zip(to_list_variants(), fh, progress=progress, max_edge=job.params.get('max_edge'))
+
+
+@handler(Job.KIND_EBAY_COMPS)
+def _ebay_comps(job, progress):
+    client = get_client()
+    if client is None:
+        raise RuntimeError('eBay is not configured.')
+    result = price_variants(comp_variants(job.params.get('ids')), client, progress=progress)
+    job.message = f'Priced {result.priced} variants ({result.failed} failed).'
+
+
+@handler(Job.KIND_IMPORT)
+def _import(job, progress):
+    with job.upload.open('rb') as fh:
+        total, rows = read_rows(fh, job.upload.name)
+        progress.set_total(total)
+        result = ingest_rows(rows, progress=progress)
+    job.message = (
+        f'Imported {result.imported} rows successfully '
+        f'({result.created} created, {result.updated} updated, {result.skipped} skipped).'
+    )
+    job.upload.delete(save=False)
+
+
+def worker_id():
+    # Evaluated per call: gunicorn forks workers after the module may have been imported
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _local_pid(worker):
+    """The pid of ``worker`` if it ran on this host, else ``None``."""
+    host, _, pid = worker.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return None
+    return int(pid)
+
+
+def _worker_gone(worker):
+    """True when ``worker`` was a process on this host that no longer exists."""
+    pid = _local_pid(worker)
+    if pid is None or pid == os.getpid():
+        return False  # cannot tell from here / still us; requeue_stale covers the former
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:  # exists but belongs to someone else
+        return False
+    return False
+
+
+def _requeue(jobs):
+    return jobs.filter(status=Job.RUNNING).update(status=Job.QUEUED, started_at=None, done=0, worker='')
+
+
+def requeue_dead():
+    """Put jobs whose process on this host has exited back in the queue."""
+    running = Job.objects.filter(status=Job.RUNNING).values_list('pk', 'worker')
+    return _requeue(Job.objects.filter(pk__in=[pk for pk, worker in running if _worker_gone(worker)]))
+
+
+def requeue_stale(older_than):
+    """Put jobs started before ``older_than`` back in the queue when their worker cannot be checked.
+
+    Jobs of processes on this host are left to :func:`requeue_dead`: a long
+    job on a live worker is never run twice.
+    """
+    running = Job.objects.filter(status=Job.RUNNING, started_at__lt=older_than).values_list('pk', 'worker')
+    return _requeue(Job.objects.filter(pk__in=[pk for pk, worker in running if _local_pid(worker) is None]))
+
+
+def recover():
+    """Requeue jobs orphaned by dead workers and hand the queue to this process's pool."""
+    n = requeue_dead()
+    n += requeue_stale(timezone.now() - timedelta(minutes=getattr(settings, 'JOBS_STALE_MINUTES', 60)))
+    if n:
+        logger.warning('Requeued %d job(s) left running by a dead worker', n)
+    for pk in Job.objects.filter(status=Job.QUEUED).order_by('created_at', 'pk').values_list('pk', flat=True):
+        _executor().submit(_run_in_thread, pk)
+
+
+def recover_on_first_request(**kwargs):
+    """``request_started`` receiver: run :func:`recover` once per web process."""
+    global _recovered
+    with _pool_lock:
+        if _recovered:
+            return
+        _recovered = True
+    try:
+        recover()
+    except Exception:
+        logger.exception('Recovering background jobs failed')
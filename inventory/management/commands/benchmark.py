@@ -0,0 +1,348 @@
+import argparse
+import csv
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.http import HttpResponse
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from inventory import csv_sync, exports, importer
+from inventory.models import Product, ProductImage, Variant
+
+BATCH = 5000
+
+
+def seed_variants(n, per_product=3):
+    """Bulk-insert ``n`` variants (signals are bypassed) into the benchmark database."""
+    Variant.objects.all().delete()
+    Product.objects.all().delete()
+    made = 0
+    product_no = 0
+    while made < n:
+        count = min(BATCH, n - made)
+        products = [
+            Product(main_sku=f"{product_no + i + 1:06d}", name=f"Benchmark item {product_no + i}",
+                    brand='Bench', category='Clothing')
+            for i in range((count + per_product - 1) // per_product)
+        ]
+        Product.objects.bulk_create(products)
+        products = list(Product.objects.filter(main_sku__in=[p.main_sku for p in products]))
+        variants = []
+        for i in range(count):
+            p = products[i // per_product]
+            variants.append(Variant(
+                product=p, variant_sku=f"BENCH-{made + i:07d}", size='M', colour='Black',
+                date=date(2025, 1, 1), cost=Decimal('4.00'), price=Decimal('19.99'),
+                fees=Decimal('1.70'), net=Decimal('18.29'), profit=Decimal('14.29'), margin=Decimal('71.49'),
+                qty=1, location='Spare Room', status='Listed',
+            ))
+        Variant.objects.bulk_create(variants)
+        made += count
+        product_no += len(products)
+
+
+def measure(fn):
+    """Run ``fn`` and return (seconds, seconds to first chunk, peak traced bytes, ru_maxrss KiB, output bytes).
+
+    ``fn`` returns the ``perf_counter()`` time its first chunk was produced,
+    or ``None`` when the output is only available at the end; optionally as
+    ``(first, output_bytes)`` when the size of what it produced matters.
+    ``ru_maxrss`` is the peak of the whole process, so it only describes
+    ``fn`` when ``fn`` is the one thing the process runs (see ``--child``).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    first, size = first if isinstance(first, tuple) else (first, None)
+    return elapsed, (first - start) if first else elapsed, peak, rss, size
+
+
+def legacy_csv():
+    """The pre-streaming export: cached queryset into a buffered HttpResponse.
+
+    Nothing can be sent before the whole body is built, so there is no
+    separate first-byte time.
+    """
+    response = HttpResponse(content_type='text/csv')
+    writer = csv.writer(response)
+    writer.writerow(exports.EXPORT_HEADERS)
+    for v in Variant.objects.select_related('product').all():
+        writer.writerow([
+            v.product.main_sku, v.variant_sku, v.product.name, v.product.brand, v.product.category,
+            v.size, v.condition, v.colour, v.date.strftime('%d/%m/%Y'), f"{v.cost:.2f}", f"{v.price:.2f}", f"{v.fees:.2f}",
+            f"{v.net:.2f}", f"{v.profit:.2f}", f"{v.margin:.2f}%", v.qty, v.location, v.status
+        ])
+    return None
+
+
+def streaming_csv():
+    first = None
+    for chunk in exports.stream_csv(Variant.objects.all()):
+        if first is None:
+            first = time.perf_counter()
+    return first
+
+
+def legacy_xlsx():
+    """The pre-write-only export: full in-memory workbook saved to BytesIO, then copied."""
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    ws.append(exports.EXPORT_HEADERS)
+    for v in Variant.objects.select_related('product').all():
+        ws.append([
+            v.product.main_sku, v.variant_sku, v.product.name, v.product.brand, v.product.category,
+            v.size, v.condition, v.colour, v.date.strftime('%d/%m/%Y'), float(v.cost), float(v.price), float(v.fees),
+            float(v.net), float(v.profit), f"{v.margin:.2f}%", v.qty, v.location, v.status
+        ])
+    bio = io.BytesIO()
+    wb.save(bio)
+    HttpResponse(bio.getvalue())
+    return None
+
+
+def writeonly_xlsx():
+    tmp = exports.xlsx_tempfile(Variant.objects.all())
+    first = time.perf_counter()
+    while tmp.read(64 * 1024):
+        pass
+    tmp.close()
+    return first
+
+
+def import_rows(n):
+    """Synthetic supplier sheet: ``n`` rows, a third of them updating earlier SKUs."""
+    rows = []
+    for i in range(n):
+        ref = i if i % 3 else max(0, i - 1)
+        rows.append({
+            'Product Name': f"Import item {i}", 'Brand': 'Bench', 'Category': 'Clothing',
+            'Variant SKU': f"IMP-{ref:07d}", 'Size': 'M', 'Colour': 'Black', 'Date': '01/01/2025',
+            'Cost': '4.00', 'Price': '£19.99', 'Qty': '1', 'Location': 'Spare Room', 'Status': 'Draft',
+        })
+    return rows
+
+
+def legacy_import(rows):
+    """The pre-batching importer: per-row lookups and saves, signals firing on each."""
+    for row in rows:
+        rec = importer.parse_row(row)
+        product = Product.objects.create(name=rec['name'], brand=rec['brand'], category=rec['category'])
+        variant = Variant.objects.filter(variant_sku=rec['variant_sku']).first() or Variant(
+            product=product, variant_sku=rec['variant_sku'])
+        for field, value in rec['variant'].items():
+            setattr(variant, field, value)
+        variant.save()
+
+
+def batched_import(rows):
+    importer.ingest_rows(rows)
+
+
+def seed_snapshot(n):
+    """Seed ``n`` variants and build the initial CSV snapshot."""
+    seed_variants(n)
+    csv_sync.sync(full=True)
+
+
+def snapshot_variant(n):
+    """The variant the snapshot scenario edits."""
+    return Variant.objects.order_by('id').values_list('pk', flat=True)[n // 2]
+
+
+def legacy_snapshot(pk):
+    """The pre-segmented snapshot: every change rewrote the whole file from the database."""
+    Variant.objects.filter(pk=pk).update(qty=F('qty') + 1)
+    path = csv_sync._csv_path()
+    tmp_path = path.with_suffix('.csv.tmp')
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(exports.EXPORT_HEADERS)
+        for v in Variant.objects.select_related('product').all():
+            writer.writerow([
+                v.product.main_sku, v.variant_sku, v.product.name, v.product.brand, v.product.category,
+                v.size, v.condition, v.colour, v.date.strftime('%d/%m/%Y') if v.date else '',
+                f"{v.cost:.2f}", f"{v.price:.2f}", f"{v.fees:.2f}", f"{v.net:.2f}", f"{v.profit:.2f}",
+                f"{v.margin:.2f}%", v.qty, v.location, v.status,
+            ])
+    os.replace(tmp_path, path)
+
+
+def segmented_snapshot(pk):
+    Variant.objects.filter(pk=pk).update(qty=F('qty') + 1)
+    csv_sync.sync(variant_ids=[pk])
+
+
+def seed_to_list(n, images_per_variant=2):
+    """Seed ``n`` "To List" variants with photos (a few ~1 MB JPEGs shared between rows)."""
+    from PIL import Image
+    seed_variants(n)
+    Variant.objects.update(status='To List')
+    folder = os.path.join(settings.MEDIA_ROOT, 'bench')
+    os.makedirs(folder, exist_ok=True)
+    names = []
+    for i in range(4):
+        name = f'bench/photo-{i}.jpg'
+        if not os.path.exists(os.path.join(settings.MEDIA_ROOT, name)):
+            Image.effect_noise((2400, 1800), 40 + i).convert('RGB').save(
+                os.path.join(settings.MEDIA_ROOT, name), 'JPEG', quality=85,
+            )
+        names.append(name)
+    ProductImage.objects.all().delete()
+    ids = list(Variant.objects.values_list('pk', flat=True))
+    for i in range(0, len(ids), BATCH):
+        ProductImage.objects.bulk_create([
+            ProductImage(variant_id=pk, image=names[(pk + k) % len(names)])
+            for pk in ids[i:i + BATCH] for k in range(images_per_variant)
+        ])
+
+
+def legacy_zip():
+    """The pre-streaming ZIP: built in a BytesIO, every image read whole and re-deflated."""
+    mem = io.BytesIO()
+    with zipfile.ZipFile(mem, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for v in exports.to_list_variants():
+            for idx, img in enumerate(v.images.all(), start=1):
+                with open(img.image.path, 'rb') as fh:
+                    zf.writestr(f"{v.variant_sku}/images/{idx:02d}.jpg", fh.read())
+    body = mem.getvalue()
+    HttpResponse(body)
+    return None, len(body)
+
+
+def tempfile_zip():
+    tmp = exports.to_list_zip_tempfile(exports.to_list_variants())
+    first = time.perf_counter()
+    size = 0
+    while True:
+        chunk = tmp.read(64 * 1024)
+        if not chunk:
+            break
+        size += len(chunk)
+    tmp.close()
+    return first, size
+
+
+def resized_zip(workers):
+    tmp = tempfile.TemporaryFile()
+    exports.write_to_list_zip(exports.to_list_variants(), tmp, max_edge=1600, workers=workers)
+    size = tmp.tell()
+    tmp.close()
+    return None, size
+
+
+def _empty():
+    Variant.objects.all().delete()
+    Product.objects.all().delete()
+
+
+# scenario -> (seed(n) filling the database or None, payload(n) built in the
+# measured process or None, reset() run untimed before each implementation or
+# None, [(label, run(payload))])
+SCENARIOS = {
+    'export_csv': (seed_variants, None, None, [
+        ('legacy', lambda _: legacy_csv()), ('streaming', lambda _: streaming_csv()),
+    ]),
+    'export_xlsx': (seed_variants, None, None, [
+        ('legacy', lambda _: legacy_xlsx()), ('write-only', lambda _: writeonly_xlsx()),
+    ]),
+    'import': (None, import_rows, _empty, [('legacy', legacy_import), ('batched', batched_import)]),
+    'export_zip': (seed_to_list, None, None, [
+        ('legacy', lambda _: legacy_zip()), ('tempfile', lambda _: tempfile_zip()),
+    ]),
+    # photos resized to a 1600px edge: one worker vs one per core
+    'export_zip_resized': (seed_to_list, None, None, [
+        ('serial', lambda _: resized_zip(1)), ('parallel', lambda _: resized_zip(os.cpu_count() or 1)),
+    ]),
+    # one edited variant, then the snapshot refresh it triggers
+    'csv_snapshot': (seed_snapshot, snapshot_variant, None, [
+        ('legacy', legacy_snapshot), ('segmented', segmented_snapshot),
+    ]),
+}
+
+
+class Command(BaseCommand):
+    help = 'Run performance benchmarks against a throwaway database seeded with synthetic variants.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS))
+        parser.add_argument('--sizes', default='10000,100000,1000000',
+                            help='Comma separated variant counts to seed (default: %(default)s).')
+        parser.add_argument('--skip-legacy', action='store_true', help='Only run the current implementation.')
+        # Internal: measure one implementation in a fresh process against an already seeded database
+        parser.add_argument('--child', nargs=3, metavar=('IMPL', 'DATABASE', 'MEDIA_ROOT'), help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        except ValueError:
+            raise CommandError('--sizes must be a comma separated list of integers')
+        seed, payload, reset, runs = SCENARIOS[options['scenario']]
+        if options['child']:
+            return self.run_child(options['child'], sizes[0], payload, dict(runs))
+        if options['skip_legacy']:
+            runs = [r for r in runs if r[0] != 'legacy']
+
+        tmpdir = tempfile.mkdtemp(prefix='skuportal-bench-')
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # Keep snapshot files written by the scenarios out of the real media folder
+        media_root = os.path.join(tmpdir, 'media')
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        try:
+            self.stdout.write(
+                f"{'rows':>10} {'impl':>10} {'seconds':>9} {'rows/s':>10} {'first byte':>11} {'peak MiB':>9} {'maxrss MiB':>11} {'out MiB':>8}"
+            )
+            for n in sizes:
+                if seed:
+                    seed(n)
+                for label, _ in runs:
+                    if reset:
+                        reset()
+                    # A fresh process per run: ru_maxrss is a process-lifetime peak
+                    proc = subprocess.run(
+                        [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark',
+                         options['scenario'], '--sizes', str(n),
+                         '--child', label, connection.settings_dict['NAME'], media_root],
+                        capture_output=True, text=True,
+                    )
+                    if proc.returncode:
+                        raise CommandError(f'{label} run failed:\n{proc.stderr}')
+                    elapsed, first, peak, rss, size = json.loads(proc.stdout.splitlines()[-1])
+                    out = f"{size / 2**20:.1f}" if size is not None else '-'
+                    self.stdout.write(
+                        f"{n:>10} {label:>10} {elapsed:>9.2f} {n / elapsed if elapsed else 0:>10.0f} "
+                        f"{first:>11.3f} {peak / 2**20:>9.1f} {rss / 1024:>11.1f} {out:>8}"
+                    )
+        finally:
+            media.disable()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run_child(self, child, n, payload, runs):
+        label, database, media_root = child
+        connection.settings_dict['NAME'] = database
+        with override_settings(MEDIA_ROOT=media_root):
+            data = payload(n) if payload else None
+            result = measure(lambda: runs[label](data))
+        self.stdout.write(json.dumps(result))
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from inventory.exports import to_list_variants
+from inventory.filters import filter_products
+from inventory.models import Product, Variant
+
+
+def hot_queries(using='default'):
+    """``(label, queryset, index expected in its plan)`` for the busiest list queries."""
+    products = Product.objects.using(using).all()
+    listed = Variant.objects.using(using).select_related('product').filter(status='Listed', product__archived=False)
+    return [
+        ('dashboard: category filter',
+         filter_products(products, '', '', 'Clothing', False).distinct().order_by('-id')[:101],
+         'product_active_category_idx'),
+        ('dashboard: sort by name',
+         filter_products(products, '', '', '', False).distinct().order_by('name', 'id')[:101],
+         'product_active_name_idx'),
+        ('dashboard: sort by brand',
+         filter_products(products, '', '', '', False).distinct().order_by('-brand', '-id')[:101],
+         'product_active_brand_idx'),
+        ('dashboard: status filter',
+         filter_products(products, '', 'Listed', '', False).distinct().order_by('-id')[:101],
+         'variant_status_product_idx'),
+        ('storefront: sort by price', listed.order_by('price', '-id')[:120], 'variant_status_price_idx'),
+        ('export: To List', to_list_variants().using(using).prefetch_related(None), 'variant_status_product_idx'),
+        ('locations', Variant.objects.using(using).values_list('location', flat=True).distinct(),
+         'variant_location_idx'),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the dashboard/storefront list queries and fail if one no longer uses its index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Run ANALYZE first so the planner sees current table statistics.')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        connection = connections[using]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'Query plan checks are written for SQLite, not {connection.vendor}.')
+        if Product._meta.db_table not in connection.introspection.table_names():
+            raise CommandError(f'No inventory tables in the {using!r} database; run "manage.py migrate" first.')
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        failed = []
+        for label, qs, index in hot_queries(using):
+            plan = qs.explain()
+            ok = index in plan
+            if not ok:
+                failed.append(label)
+            style = self.style.SUCCESS if ok else self.style.ERROR
+            self.stdout.write(style(f"{'ok  ' if ok else 'FAIL'} {label} ({index})"))
+            if not ok or options['verbosity'] > 1:
+                for line in plan.splitlines():
+                    self.stdout.write(f'       {line}')
+        if failed:
+            raise CommandError(f'{len(failed)} query plan(s) missed their index: ' + ', '.join(failed))
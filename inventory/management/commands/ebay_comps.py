@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.comps import comp_variants, price_variants
+from inventory.ebay import get_client
+
+
+class Command(BaseCommand):
+    help = 'Fetch eBay price comps for variants (default: every "To List" variant) and store them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='Variant ids to price instead of the "To List" set.')
+        parser.add_argument('--workers', type=int, help='Concurrent searches (default EBAY_COMPS_CONCURRENCY).')
+        parser.add_argument('--limit', type=int, default=20, help='Listings to compare per search (max 50).')
+
+    def handle(self, *args, **options):
+        client = get_client()
+        if client is None:
+            raise CommandError('eBay is not configured; set EBAY_* settings and EBAY_ENABLED=1.')
+        started = time.monotonic()
+        result = price_variants(
+            comp_variants(options['ids']), client, limit=options['limit'], workers=options['workers'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Priced {result.priced} variant(s) from {result.queries} search(es); '
+            f'{result.failed} failed ({time.monotonic() - started:.1f}s).'
+        ))
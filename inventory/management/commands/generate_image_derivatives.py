@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from inventory import images
+from inventory.models import ProductImage
+
+
+class Command(BaseCommand):
+    help = 'Backfill thumbnail/medium/WebP derivatives for product images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate images that already have derivatives.')
+
+    def handle(self, *args, **options):
+        qs = ProductImage.objects.order_by('pk')
+        if not options['force']:
+            qs = qs.filter(thumb='')
+        done = failed = 0
+        for img in qs.iterator(chunk_size=200):
+            try:
+                images.generate(img)
+                done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'Image {img.pk} ({img.image.name}): {e}')
+        self.stdout.write(self.style.SUCCESS(f'Generated derivatives for {done} image(s); {failed} failed.'))
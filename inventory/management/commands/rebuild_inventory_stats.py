@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventory import stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the InventoryStats rollup behind the home page KPIs from scratch.'
+
+    def handle(self, *args, **options):
+        stats.rebuild()
+        self.stdout.write(self.style.SUCCESS('Inventory stats rebuilt.'))
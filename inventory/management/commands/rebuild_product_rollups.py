@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventory import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-product variant rollups (counts, prices, status, photo) from scratch.'
+
+    def handle(self, *args, **options):
+        rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS('Product rollups rebuilt.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from inventory import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index used by the dashboard and storefront.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not search.available(using):
+            self.stdout.write(self.style.WARNING('Search index not available on this database; nothing to do.'))
+            return
+        search.rebuild(using=using)
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
@@ -0,0 +1,94 @@
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, ExpressionWrapper, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Abs
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from inventory import csv_sync, stats
+from inventory.constants import VINTED_FEE_PERCENT, VINTED_FIXED_FEE
+from inventory.finance import CENT, MONEY, auto_fees_condition, financial_updates
+from inventory.models import Variant
+
+DERIVED_FIELDS = ['fees', 'net', 'profit', 'margin']
+
+
+def differs(field, expression):
+    # Stored values are rounded to the penny; anything closer than half of one is unchanged
+    return Q(GreaterThanOrEqual(Abs(F(field) - expression), Value(CENT / 2)))
+
+
+def signed(amount):
+    return f'{amount.quantize(CENT) + 0:+.2f}'  # + 0 turns -0.00 into 0.00
+
+
+class Command(BaseCommand):
+    help = ('Recompute the stored fees, net, profit and margin of every variant in SQL, '
+            'e.g. after VINTED_FEE_PERCENT / VINTED_FIXED_FEE change.')
+
+    def add_arguments(self, parser):
+        # Required: defaulting to the current constants would take every auto fee made
+        # under the old ones for a hand-typed fee, and the run would change nothing
+        parser.add_argument('--old-percent', type=Decimal, required=True,
+                            help=f'Fee percentage the stored auto fees were calculated with (now {VINTED_FEE_PERCENT}).')
+        parser.add_argument('--old-fixed', type=Decimal, required=True,
+                            help=f'Fixed fee the stored auto fees were calculated with (now {VINTED_FIXED_FEE}).')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Variant ids per UPDATE.')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        # Fees still matching the old constants were auto-calculated: they move to the
+        # current constants.  Fees typed in by hand are kept; net, profit and margin
+        # are rederived for every row.
+        values = financial_updates(F('price'), auto=auto_fees_condition(options['old_percent'], options['old_fixed']))
+        del values['price']
+        changed = {field: differs(field, values[field]) for field in DERIVED_FIELDS}
+        any_changed = Q()
+        for condition in changed.values():
+            any_changed |= condition
+
+        started = time.monotonic()
+        bounds = Variant.objects.aggregate(lo=Min('pk'), hi=Max('pk'), total=Count('pk'))
+        totals = dict.fromkeys(['rows', *DERIVED_FIELDS], 0)
+        fees_delta = profit_delta = Decimal(0)
+        if bounds['total']:
+            now = timezone.now()
+            for start in range(bounds['lo'], bounds['hi'] + 1, options['chunk_size']):
+                chunk = Variant.objects.filter(pk__gte=start, pk__lt=start + options['chunk_size'])
+                if options['dry_run']:
+                    # Aliases are prefixed so they cannot shadow the model's own columns
+                    found = chunk.aggregate(
+                        n_rows=Count('pk', filter=any_changed),
+                        **{f'n_{field}': Count('pk', filter=changed[field]) for field in DERIVED_FIELDS},
+                        fees_delta=Sum(ExpressionWrapper(values['fees'] - F('fees'), output_field=MONEY)),
+                        profit_delta=Sum(ExpressionWrapper(values['profit'] - F('profit'), output_field=MONEY)),
+                    )
+                    for key in totals:
+                        totals[key] += found[f'n_{key}']
+                    fees_delta += found['fees_delta'] or 0
+                    profit_delta += found['profit_delta'] or 0
+                else:
+                    # Each chunk commits on its own, so writers are never locked out for long
+                    totals['rows'] += chunk.filter(any_changed).update(**values, updated_at=now)
+
+        elapsed = time.monotonic() - started
+        if options['dry_run']:
+            per_field = ', '.join(f'{field} {totals[field]}' for field in DERIVED_FIELDS)
+            self.stdout.write(
+                f'Would update {totals["rows"]} of {bounds["total"]} variant(s) ({per_field}); '
+                f'fees {signed(fees_delta)}, profit {signed(profit_delta)} in total ({elapsed:.1f}s).'
+            )
+            return
+        if totals['rows']:
+            # The KPI rollup sums net, profit and margin; the CSV snapshot lists them
+            stats.rebuild()
+            if getattr(settings, 'CSV_SYNC_ENABLED', True):
+                csv_sync.write_csv_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed financials: {totals["rows"]} of {bounds["total"]} variant(s) changed ({elapsed:.1f}s).'
+        ))
@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (imports, XLSX and To List exports) outside the web process.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit instead of polling.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--stale-minutes', type=int, default=60,
+                            help='On start, requeue jobs of other hosts stuck in "running" for longer than this '
+                                 '(0 to skip); jobs of exited processes on this host are always requeued.')
+
+    def handle(self, *args, **options):
+        n = jobs.requeue_dead()
+        if options['stale_minutes']:
+            n += jobs.requeue_stale(timezone.now() - timedelta(minutes=options['stale_minutes']))
+        if n:
+            self.stdout.write(f'Requeued {n} stale job(s).')
+        while True:
+            job = jobs.run_next()
+            if job is not None:
+                style = self.style.SUCCESS if job.status == job.SUCCEEDED else self.style.ERROR
+                self.stdout.write(style(f'{job}: {job.message or job.status}'))
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,155 @@
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from inventory.models import Product, Variant
+from skuportal.db import SQLITE_PROFILES, sqlite_options
+
+from .benchmark import seed_variants
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {'read': [], 'write': []}
+        self.locked = {'read': 0, 'write': 0}
+        self.errors = 0
+
+    def record(self, kind, started, error=None):
+        with self.lock:
+            if error is None:
+                self.latencies[kind].append(time.perf_counter() - started)
+            elif isinstance(error, OperationalError) and 'locked' in str(error):
+                self.locked[kind] += 1
+            else:
+                self.errors += 1
+
+
+def read_page(ids):
+    """A dashboard page: products with their variants."""
+    start = random.randrange(max(1, len(ids) - 100))
+    products = Product.objects.filter(pk__in=ids[start:start + 100]).prefetch_related('variants')
+    for p in products:
+        list(p.variants.all())
+
+
+def read_snapshot(ids):
+    """A CSV-snapshot style scan over a slice of variants."""
+    list(Variant.objects.select_related('product').filter(product_id__in=ids[:500]).values_list('variant_sku', 'qty'))
+
+
+def write_edit(variant_ids):
+    """The edit view: load a variant and save it (signals included) in one transaction."""
+    with transaction.atomic():
+        v = Variant.objects.select_related('product').get(pk=random.choice(variant_ids))
+        v.qty += 1
+        v.save()
+
+
+def worker(kind, stop, stats, product_ids, variant_ids):
+    try:
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                if kind == 'write':
+                    write_edit(variant_ids)
+                elif random.random() < 0.8:
+                    read_page(product_ids)
+                else:
+                    read_snapshot(product_ids)
+            except Exception as e:
+                stats.record(kind, started, e)
+            else:
+                stats.record(kind, started)
+            # What Django does at the end of each request: close unless CONN_MAX_AGE allows reuse
+            close_old_connections()
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Run concurrent readers and writers against a throwaway SQLite database under each tuning profile.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--rows', type=int, default=5000, help='Variants to seed (default: %(default)s).')
+        parser.add_argument('--profiles', default='plain,tuned',
+                            help=f"Comma separated, from {', '.join(SQLITE_PROFILES)} (default: %(default)s).")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This stress test only applies to SQLite.')
+        profiles = [p.strip() for p in options['profiles'].split(',') if p.strip()]
+        unknown = [p for p in profiles if p not in SQLITE_PROFILES]
+        if unknown:
+            raise CommandError(f"Unknown profile(s): {', '.join(unknown)}")
+
+        tmpdir = tempfile.mkdtemp(prefix='skuportal-stress-')
+        saved = {k: connection.settings_dict.get(k) for k in ('OPTIONS', 'CONN_MAX_AGE')}
+        setup_test_environment()
+        # No CSV snapshot threads or media writes from the saves
+        quiet = override_settings(CSV_SYNC_ENABLED=False, MEDIA_ROOT=os.path.join(tmpdir, 'media'))
+        quiet.enable()
+        self.stdout.write(
+            f"{'profile':>8} {'reads/s':>9} {'writes/s':>9} {'read p95 ms':>12} {'write p95 ms':>13} "
+            f"{'locked r/w':>11} {'errors':>7}"
+        )
+        try:
+            for profile in profiles:
+                stats = self.run_profile(profile, tmpdir, options)
+                secs = options['seconds']
+                reads, writes = stats.latencies['read'], stats.latencies['write']
+                self.stdout.write(
+                    f"{profile:>8} {len(reads) / secs:>9.0f} {len(writes) / secs:>9.0f} "
+                    f"{_percentile(reads, 95) * 1000:>12.1f} {_percentile(writes, 95) * 1000:>13.1f} "
+                    f"{stats.locked['read']:>5}/{stats.locked['write']:<5} {stats.errors:>7}"
+                )
+        finally:
+            quiet.disable()
+            teardown_test_environment()
+            connection.settings_dict.update(saved)
+
+    def run_profile(self, profile, tmpdir, options):
+        connection.close()
+        # The settings dict is shared by every thread's connection
+        connection.settings_dict['OPTIONS'] = sqlite_options(profile)
+        connection.settings_dict['CONN_MAX_AGE'] = settings.DATABASES['default'].get('CONN_MAX_AGE', 0) if profile == 'tuned' else 0
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmpdir, f'stress-{profile}.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed_variants(options['rows'])
+            product_ids = list(Product.objects.values_list('pk', flat=True))
+            variant_ids = list(Variant.objects.values_list('pk', flat=True))
+            connection.close()
+            stats = Stats()
+            stop = threading.Event()
+            threads = [
+                threading.Thread(target=worker, args=(kind, stop, stats, product_ids, variant_ids))
+                for kind, count in (('read', options['readers']), ('write', options['writers']))
+                for _ in range(count)
+            ]
+            for t in threads:
+                t.start()
+            time.sleep(options['seconds'])
+            stop.set()
+            for t in threads:
+                t.join()
+            return stats
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+from inventory import search
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if not search.fts_supported(connection):
+        return
+    with connection.cursor() as cur:
+        for sql in search.CREATE_SQL:
+            cur.execute(sql)
+    search._available.pop(connection.alias, None)
+    search.rebuild(using=connection.alias)
+
+
+def drop_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cur:
+        for sql in search.DROP_SQL:
+            cur.execute(sql)
+    search._available.pop(connection.alias, None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_product_archived'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
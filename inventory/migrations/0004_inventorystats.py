@@ -0,0 +1,74 @@
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+
+def populate(apps, schema_editor):
+    InventoryStats = apps.get_model('inventory', 'InventoryStats')
+    Product = apps.get_model('inventory', 'Product')
+    Variant = apps.get_model('inventory', 'Variant')
+    money = DecimalField(max_digits=14, decimal_places=2)
+    rows = []
+    grouped = (
+        Variant.objects.values('status', 'location', 'product__category', 'product__brand')
+        .annotate(
+            agg_variants=Count('id'),
+            agg_qty=Sum('qty'),
+            agg_price_total=Sum('price'),
+            agg_cost_total=Sum('cost'),
+            agg_stock_value=Sum(ExpressionWrapper(F('price') * F('qty'), output_field=money)),
+            agg_stock_cost=Sum(ExpressionWrapper(F('cost') * F('qty'), output_field=money)),
+            agg_net_total=Sum('net'),
+            agg_profit_total=Sum('profit'),
+            agg_margin_total=Sum('margin'),
+        )
+        .order_by()
+    )
+    for row in grouped:
+        rows.append(InventoryStats(
+            scope='variant',
+            status=row['status'] or '',
+            location=row['location'] or '',
+            category=row['product__category'] or '',
+            brand=row['product__brand'] or '',
+            **{k[4:]: v or 0 for k, v in row.items() if k.startswith('agg_')},
+        ))
+    for row in Product.objects.values('category', 'brand').annotate(products=Count('id')).order_by():
+        rows.append(InventoryStats(
+            scope='product', category=row['category'] or '', brand=row['brand'] or '', products=row['products'],
+        ))
+    InventoryStats.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=10)),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('category', models.CharField(blank=True, max_length=120)),
+                ('brand', models.CharField(blank=True, max_length=120)),
+                ('location', models.CharField(blank=True, max_length=120)),
+                ('products', models.IntegerField(default=0)),
+                ('variants', models.IntegerField(default=0)),
+                ('qty', models.IntegerField(default=0)),
+                ('price_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cost_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('stock_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('net_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('profit_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('margin_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('scope', 'status', 'category', 'brand', 'location'), name='inventory_stats_unique_key')],
+            },
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+def seed(apps, schema_editor):
+    SkuSequence = apps.get_model('inventory', 'SkuSequence')
+    Product = apps.get_model('inventory', 'Product')
+    skus = Product.objects.filter(main_sku__regex=r'^[0-9]+$').values_list('main_sku', flat=True)
+    SkuSequence.objects.create(name='main_sku', last=max((int(s) for s in skus), default=0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkuSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=40, unique=True)),
+                ('last', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_productimage_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceComp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('median', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('average', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('suggested_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('fetched_at', models.DateTimeField()),
+                ('variant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='price_comp', to='inventory.variant')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('import', 'Import'), ('export_xlsx', 'XLSX export'), ('export_to_list_zip', 'To List ZIP'), ('ebay_comps', 'eBay price comps')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from inventory import search
+
+
+def create_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if not search.trigram_supported(connection):
+        return
+    with connection.cursor() as cur:
+        for sql in search.TRIGRAM_CREATE_SQL:
+            cur.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cur:
+        for sql in search.TRIGRAM_DROP_SQL:
+            cur.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
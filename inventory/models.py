@@ -1,12 +1,59 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
 from django.utils import timezone
 from django.core.validators import MinValueValidator
-from decimal import Decimal
-from .constants import VINTED_FEE_PERCENT, VINTED_FIXED_FEE
+from .finance import compute_financials
 
 CONDITION_CHOICES = None  # handled via forms (configurable)
 STATUS_CHOICES = None     # handled via forms (configurable)
 
+class SkuSequence(models.Model):
+    """Named counters behind auto-generated SKUs (``main_sku``: 001, 002, ...).
+
+    Numbers are handed out with a single ``UPDATE ... SET last = last + n``
+    so concurrent creates and imports never receive the same value, and a
+    bulk import can reserve a whole block in one round trip.
+    """
+    MAIN_SKU = 'main_sku'
+
+    name = models.CharField(max_length=40, unique=True)
+    last = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.last}"
+
+    @classmethod
+    def reserve(cls, name, count=1):
+        """Atomically claim ``count`` consecutive numbers; returns them as a range."""
+        with transaction.atomic():
+            if not cls.objects.filter(name=name).update(last=F('last') + count):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(name=name, last=cls._initial(name))
+                except IntegrityError:
+                    pass  # created concurrently
+                cls.objects.filter(name=name).update(last=F('last') + count)
+            last = cls.objects.filter(name=name).values_list('last', flat=True).get()
+        return range(last - count + 1, last + 1)
+
+    @classmethod
+    def observe(cls, name, value):
+        """Move the counter past a number that was assigned by hand."""
+        # A counter that does not exist yet is seeded from the data on first use
+        cls.objects.filter(name=name, last__lt=value).update(last=value)
+
+    @classmethod
+    def _initial(cls, name):
+        # Seed from existing data the first time a counter is used
+        if name == cls.MAIN_SKU:
+            skus = Product.objects.filter(main_sku__regex=r'^[0-9]+$').values_list('main_sku', flat=True)
+            return max((int(s) for s in skus), default=0)
+        return 0
+
+def reserve_main_skus(count):
+    """``count`` fresh zero-padded main SKUs, reserved in one step."""
+    return [f"{n:03d}" for n in SkuSequence.reserve(SkuSequence.MAIN_SKU, count)]
+
 class Product(models.Model):
     main_sku = models.CharField(max_length=10, unique=True, blank=True)
     name = models.CharField(max_length=255)
@@ -14,17 +61,52 @@ class Product(models.Model):
     category = models.CharField(max_length=120, default='Clothing')
     archived = models.BooleanField(default=False, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Version stamp for cached cards; also moved by inventory.fragments when related rows change
+    updated_at = models.DateTimeField(auto_now=True)
+    # Rollups of the variants, kept current by inventory.rollups
+    variant_count = models.PositiveIntegerField(default=0, editable=False)
+    total_qty = models.PositiveIntegerField(default=0, editable=False)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    dominant_status = models.CharField(max_length=20, blank=True, editable=False)
+    top_variant = models.ForeignKey('Variant', null=True, blank=True, on_delete=models.SET_NULL,
+                                    related_name='+', editable=False)
+    primary_image = models.ForeignKey('ProductImage', null=True, blank=True, on_delete=models.SET_NULL,
+                                      related_name='+', editable=False)
+
+    class Meta:
+        # Dashboard filter/sort columns.  Partial on active rows: the ORM writes
+        # archived=False as "NOT archived", which SQLite can only match against an
+        # index with that same WHERE clause (see check_query_plans).
+        indexes = [
+            models.Index(fields=['category'], condition=Q(archived=False), name='product_active_category_idx'),
+            models.Index(fields=['name'], condition=Q(archived=False), name='product_active_name_idx'),
+            models.Index(fields=['brand'], condition=Q(archived=False), name='product_active_brand_idx'),
+        ]
 
     def __str__(self):
         return f"{self.main_sku or '???'} — {self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The SKU as stored, so saves that keep it skip the counter
+        instance._saved_main_sku = instance.__dict__.get('main_sku')
+        return instance
+
     def save(self, *args, **kwargs):
-        # Auto-generate main SKU (001, 002, ...) if not provided
-        if not self.main_sku:
-            last = Product.objects.order_by('-id').first()
-            next_num = 1 if not last else (int(last.main_sku) if last.main_sku.isdigit() else last.id) + 1
-            self.main_sku = f"{next_num:03d}"
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'main_sku' in update_fields:
+            # Auto-generate main SKU (001, 002, ...) if not provided
+            if not self.main_sku:
+                self.main_sku = reserve_main_skus(1)[0]
+            elif self.main_sku.isdigit() and (
+                self._state.adding or self.main_sku != getattr(self, '_saved_main_sku', None)
+            ):
+                # Keep auto-generated SKUs clear of numbers entered by hand
+                SkuSequence.observe(SkuSequence.MAIN_SKU, int(self.main_sku))
         super().save(*args, **kwargs)
+        self._saved_main_sku = self.main_sku
 
 class Variant(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variants')
@@ -42,23 +124,28 @@ class Variant(models.Model):
     qty = models.PositiveIntegerField(default=1)
     location = models.CharField(max_length=120, default='Spare Room')
     status = models.CharField(max_length=20, default='Draft')
+    updated_at = models.DateTimeField(auto_now=True)  # see Product.updated_at
+
+    class Meta:
+        indexes = [
+            # Storefront: status='Listed' ordered or bounded by price
+            models.Index(fields=['status', 'price'], name='variant_status_price_idx'),
+            # Dashboard status filter (EXISTS per product) and the To List export
+            models.Index(fields=['status', 'product'], name='variant_status_product_idx'),
+            # Location rollups and suggestions
+            models.Index(fields=['location'], name='variant_location_idx'),
+        ]
 
     def __str__(self):
         return f"{self.variant_sku or 'VAR?'}"
 
     def save(self, *args, **kwargs):
-        # Auto-populate fees if not provided: fixed + percent of price
-        if self.price is not None and (self.fees is None or self.fees == 0):
-            try:
-                self.fees = (self.price * Decimal(VINTED_FEE_PERCENT)) + Decimal(VINTED_FIXED_FEE)
-            except Exception:
-                # As a fallback do nothing; user can supply fees manually
-                pass
-        # Compute finance fields if possible
-        if self.price is not None and self.fees is not None:
-            self.net = (self.price - self.fees)
-            self.profit = self.net - (self.cost or 0)
-            self.margin = (self.profit / self.price * 100) if self.price else 0
+        # Auto-populate fees if not provided (fixed + percent of price) and
+        # compute finance fields if possible
+        fees, net, profit, margin = compute_financials(self.price, self.fees, self.cost)
+        self.fees = fees
+        if net is not None:
+            self.net, self.profit, self.margin = net, profit, margin
         # Auto variant SKU: e.g. HOOD-XL-001 using category prefix + size + main sku
         if not self.variant_sku:
             cat_prefix = (self.product.category[:4] or 'ITEM').upper()
@@ -73,3 +160,145 @@ class ProductImage(models.Model):
     variant = models.ForeignKey(Variant, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to=product_image_path)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Resized copies written by inventory.images after upload (empty until generated)
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    thumb = models.ImageField(max_length=255, blank=True, editable=False)
+    medium = models.ImageField(max_length=255, blank=True, editable=False)
+    thumb_webp = models.ImageField(max_length=255, blank=True, editable=False)
+    medium_webp = models.ImageField(max_length=255, blank=True, editable=False)
+
+    DERIVATIVE_WIDTHS = {'thumb': 320, 'medium': 960}
+
+    def _derivative_width(self, size):
+        nominal = self.DERIVATIVE_WIDTHS[size]
+        return min(nominal, self.width) if self.width else nominal
+
+    def _srcset(self, suffix=''):
+        parts = {}
+        for size in self.DERIVATIVE_WIDTHS:
+            f = getattr(self, size + suffix)
+            # Small originals give equal widths; a srcset may list each width once
+            if f and self._derivative_width(size) not in parts:
+                parts[self._derivative_width(size)] = f"{f.url} {self._derivative_width(size)}w"
+        return ', '.join(parts.values())
+
+    @property
+    def thumb_url(self):
+        return self.thumb.url if self.thumb else self.image.url
+
+    @property
+    def medium_url(self):
+        return self.medium.url if self.medium else self.image.url
+
+    @property
+    def srcset(self):
+        return self._srcset()
+
+    @property
+    def webp_srcset(self):
+        return self._srcset('_webp')
+
+class PriceComp(models.Model):
+    """Latest eBay price comparables for a variant, stored by ``inventory.comps``."""
+    variant = models.OneToOneField(Variant, on_delete=models.CASCADE, related_name='price_comp')
+    query = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=0)  # listings with a usable price
+    median = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    average = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    suggested_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.variant}: {self.suggested_price} ({self.count} comps)"
+
+class InventoryStats(models.Model):
+    """Pre-aggregated inventory totals for the home page KPIs.
+
+    Variant rows hold sums for every (status, category, brand, location)
+    combination; product rows hold product counts per (category, brand).
+    Maintained incrementally by ``inventory.stats``.
+    """
+    SCOPE_PRODUCT = 'product'
+    SCOPE_VARIANT = 'variant'
+
+    scope = models.CharField(max_length=10)
+    status = models.CharField(max_length=20, blank=True)
+    category = models.CharField(max_length=120, blank=True)
+    brand = models.CharField(max_length=120, blank=True)
+    location = models.CharField(max_length=120, blank=True)
+    products = models.IntegerField(default=0)
+    variants = models.IntegerField(default=0)
+    qty = models.IntegerField(default=0)
+    price_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cost_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    stock_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # sum(price * qty)
+    stock_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)   # sum(cost * qty)
+    net_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    profit_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    margin_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['scope', 'status', 'category', 'brand', 'location'],
+                name='inventory_stats_unique_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}: {self.status}/{self.category}/{self.brand}/{self.location}"
+
+def job_upload_path(instance, filename):
+    return f"private/jobs/uploads/{filename}"
+
+class Job(models.Model):
+    """A long-running import/export run off the request path by ``inventory.jobs``."""
+    KIND_IMPORT = 'import'
+    KIND_EXPORT_XLSX = 'export_xlsx'
+    KIND_EXPORT_TO_LIST = 'export_to_list_zip'
+    KIND_EBAY_COMPS = 'ebay_comps'
+    KIND_CHOICES = [
+        (KIND_IMPORT, 'Import'),
+        (KIND_EXPORT_XLSX, 'XLSX export'),
+        (KIND_EXPORT_TO_LIST, 'To List ZIP'),
+        (KIND_EBAY_COMPS, 'eBay price comps'),
+    ]
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    created_by = models.ForeignKey('auth.User', null=True, blank=True, on_delete=models.SET_NULL, related_name='jobs')
+    params = models.JSONField(default=dict, blank=True)
+    upload = models.FileField(upload_to=job_upload_path, blank=True)
+    done = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    message = models.TextField(blank=True)
+    result_path = models.CharField(max_length=500, blank=True)  # relative to MEDIA_ROOT
+    result_name = models.CharField(max_length=255, blank=True)  # download filename
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)  # "host:pid" of the process running it
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
+
+    @property
+    def finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    @property
+    def percent(self):
+        if self.status == self.SUCCEEDED:
+            return 100
+        if not self.total:
+            return None
+        return min(100, int(self.done * 100 / self.total))
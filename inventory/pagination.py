@@ -0,0 +1,99 @@
+"""Keyset (cursor) pagination.
+
+Pages are addressed by the sort value and id of the row at the page edge,
+so fetching page N costs the same as fetching page 1.  Cursors are opaque
+URL-safe strings and carry the sort key they were made for; a cursor from a
+different sort is ignored and the first page is returned instead.
+"""
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import List, Optional
+from django.db.models import Q
+
+
+@dataclass
+class KeysetPage:
+    items: List = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(sort: str, value, pk) -> str:
+    raw = json.dumps({'s': sort, 'v': value, 'id': pk}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str):
+    """Return ``(value, pk)`` or ``None`` when the cursor is invalid or stale."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if data.get('s') != sort:
+            return None
+        return data['v'], int(data['id'])
+    except Exception:
+        return None
+
+
+def _after(qs, name, desc, value, pk):
+    """Rows strictly after ``(value, pk)`` in ``(name, id)`` order."""
+    op = 'lt' if desc else 'gt'
+    if name == 'id':
+        return qs.filter(**{f'id__{op}': pk})
+    extra = qs.query.extra.get(name)
+    if extra:
+        # Extra-select columns (e.g. the search rank) can only be filtered in SQL
+        col, cmp = extra[0], '<' if desc else '>'
+        pk_col = f'{qs.model._meta.db_table}.id'
+        return qs.extra(
+            where=[f'(({col}) {cmp} %s OR (({col}) = %s AND {pk_col} {cmp} %s))'],
+            params=[value, value, pk],
+        )
+    return qs.filter(Q(**{f'{name}__{op}': value}) | Q(**{name: value, f'id__{op}': pk}))
+
+
+def paginate(qs, order_by: str, sort: str = '', after: str = '', before: str = '', size: int = 100) -> KeysetPage:
+    """Return one page of ``qs`` ordered by ``order_by`` with ``id`` as tiebreaker.
+
+    ``order_by`` is a single field name, optionally prefixed with ``-``.
+    ``sort`` is the user-facing sort key that cursors are bound to.
+    """
+    desc = order_by.startswith('-')
+    name = order_by.lstrip('-')
+    direction = '-' if desc else ''
+    ordering = [f'{direction}{name}'] if name == 'id' else [f'{direction}{name}', f'{direction}id']
+    reverse = [o[1:] if o.startswith('-') else f'-{o}' for o in ordering]
+
+    before_key = decode_cursor(before, sort)
+    after_key = None if before_key else decode_cursor(after, sort)
+    if before_key:
+        rows = list(_after(qs, name, not desc, *before_key).order_by(*reverse)[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size][::-1]
+        has_prev, has_next = has_more, True
+    else:
+        base = _after(qs, name, desc, *after_key) if after_key else qs
+        rows = list(base.order_by(*ordering)[:size + 1])
+        has_next = len(rows) > size
+        rows = rows[:size]
+        has_prev = after_key is not None
+
+    def cursor(obj):
+        return encode_cursor(sort, getattr(obj, name), obj.pk)
+
+    return KeysetPage(
+        items=rows,
+        next_cursor=cursor(rows[-1]) if rows and has_next else None,
+        prev_cursor=cursor(rows[0]) if rows and has_prev else None,
+    )
@@ -0,0 +1,58 @@
+"""Per-product rollups of its variants, stored on ``Product``.
+
+``variant_count``, ``total_qty``, ``min_price``/``max_price``,
+``dominant_status`` (the most common status), ``top_variant`` (highest price)
+and ``primary_image`` (first photo of the first variant that has one) let
+the dashboard list products without loading their variants or images.
+
+Each refresh is one ``UPDATE`` with correlated subqueries per chunk of
+products, so it reads and writes in the same statement.  The model signals
+refresh on variant and image saves and deletes; bulk writes that bypass
+them (queryset ``.update()``, ``bulk_create``) call :func:`refresh` for the
+products they touched.  ``manage.py rebuild_product_rollups`` recomputes
+every product.
+"""
+from django.db.models import Count, Max, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Product, ProductImage, Variant
+
+_CHUNK = 500
+
+
+def expressions(variant_model=Variant, image_model=ProductImage):
+    """Field -> subquery for ``Product.objects.update()``.
+
+    Takes the models so migrations can pass their historical versions.
+    """
+    variants = variant_model.objects.filter(product=OuterRef('pk')).order_by()
+
+    def aggregate(fn):
+        return Subquery(variants.values('product').annotate(value=fn).values('value')[:1])
+
+    return {
+        'variant_count': Coalesce(aggregate(Count('pk')), 0),
+        'total_qty': Coalesce(aggregate(Sum('qty')), 0),
+        'min_price': aggregate(Min('price')),
+        'max_price': aggregate(Max('price')),
+        'dominant_status': Coalesce(
+            Subquery(variants.values('status').annotate(n=Count('pk')).order_by('-n', 'status').values('status')[:1]),
+            Value(''),
+        ),
+        'top_variant': Subquery(variants.order_by('-price', 'pk').values('pk')[:1]),
+        'primary_image': Subquery(
+            image_model.objects.filter(variant__product=OuterRef('pk')).order_by('variant_id', 'pk').values('pk')[:1]
+        ),
+    }
+
+
+def refresh(product_ids):
+    """Recompute the rollups of the given products."""
+    ids = [pk for pk in {*product_ids} if pk is not None]
+    values = expressions()
+    for i in range(0, len(ids), _CHUNK):
+        Product.objects.filter(pk__in=ids[i:i + _CHUNK]).update(**values)
+
+
+def rebuild():
+    """Recompute the rollups of every product."""
+    Product.objects.update(**expressions())
@@ -0,0 +1,68 @@
+"""Send the storefront's and home page's reads to a read replica.
+
+Views opt in with :func:`replica_reads`.  Inside them, queries for inventory
+models go to the ``replica`` database when one is configured
+(``DATABASE_REPLICA_URL``); sessions, users and every write stay on
+``default``.  The flag is a context variable, so it follows async views into
+``sync_to_async`` threads and never leaks into other requests.
+"""
+import contextvars
+import functools
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = 'replica'
+REPLICA_APPS = {'inventory'}
+
+_use_replica = contextvars.ContextVar('skuportal_use_replica', default=False)
+
+
+@contextmanager
+def reading_from_replica():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_reads(view):
+    """Decorator for read-only views (sync or async) that can tolerate replica lag."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            with reading_from_replica():
+                return await view(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with reading_from_replica():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and model._meta.app_label in REPLICA_APPS and REPLICA in settings.DATABASES:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Rows read from the replica are saved to the primary, never back to the replica
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == REPLICA:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica follows the primary; it is never migrated directly
+        return False if db == REPLICA else None
@@ -0,0 +1,251 @@
+"""Full-text search index for the dashboard and storefront search boxes.
+
+On SQLite the index lives in two FTS5 tables (one row per product, one row per
+variant) that are kept up to date from the model signals.  Other backends, or
+SQLite builds without FTS5, fall back to the plain ``icontains`` filters.  On
+PostgreSQL those filters are served by ``pg_trgm`` GIN indexes, so they are
+written as one OR per table with a subquery for the other table; an OR
+across a join cannot use the indexes.
+"""
+import re
+from django.db import connections
+from django.db.models import Q
+from .models import Product, Variant
+
+PRODUCT_TABLE = 'inventory_product_search'
+VARIANT_TABLE = 'inventory_variant_search'
+
+# Column weights for bm25(); order matches the CREATE statements below.
+PRODUCT_RANK = 'bm25(10.0, 4.0, 2.0, 8.0, 8.0)'
+VARIANT_RANK = 'bm25(10.0, 4.0, 2.0, 8.0, 3.0, 3.0)'
+
+_CHUNK = 500
+_available = {}
+
+CREATE_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {PRODUCT_TABLE} USING fts5("
+    "name, brand, category, main_sku, skus, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {VARIANT_TABLE} USING fts5("
+    "name, brand, category, variant_sku, size, colour, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"INSERT INTO {PRODUCT_TABLE}({PRODUCT_TABLE}, rank) VALUES('rank', '{PRODUCT_RANK}')",
+    f"INSERT INTO {VARIANT_TABLE}({VARIANT_TABLE}, rank) VALUES('rank', '{VARIANT_RANK}')",
+]
+
+DROP_SQL = [
+    f"DROP TABLE IF EXISTS {PRODUCT_TABLE}",
+    f"DROP TABLE IF EXISTS {VARIANT_TABLE}",
+]
+
+_PRODUCT_ROWS = (
+    f"INSERT INTO {PRODUCT_TABLE}(rowid, name, brand, category, main_sku, skus) "
+    "SELECT p.id, p.name, p.brand, p.category, p.main_sku, "
+    "COALESCE((SELECT group_concat(v.variant_sku, ' ') FROM inventory_variant v WHERE v.product_id = p.id), '') "
+    "FROM inventory_product p"
+)
+_VARIANT_ROWS = (
+    f"INSERT INTO {VARIANT_TABLE}(rowid, name, brand, category, variant_sku, size, colour) "
+    "SELECT v.id, p.name, p.brand, p.category, v.variant_sku, v.size, v.colour "
+    "FROM inventory_variant v JOIN inventory_product p ON p.id = v.product_id"
+)
+
+
+# pg_trgm GIN indexes for the icontains filters on PostgreSQL.  Django compiles
+# field__icontains to UPPER(field::text) LIKE UPPER(%s), so each index is on
+# that expression.
+TRIGRAM_COLUMNS = [
+    ('inventory_product', 'name'),
+    ('inventory_product', 'brand'),
+    ('inventory_product', 'category'),
+    ('inventory_product', 'main_sku'),
+    ('inventory_variant', 'variant_sku'),
+    ('inventory_variant', 'size'),
+    ('inventory_variant', 'colour'),
+]
+TRIGRAM_CREATE_SQL = ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + [
+    f"CREATE INDEX IF NOT EXISTS {table}_{column}_trgm ON {table} "
+    f"USING gin ((UPPER({column}::text)) gin_trgm_ops)"
+    for table, column in TRIGRAM_COLUMNS
+]
+TRIGRAM_DROP_SQL = [f"DROP INDEX IF EXISTS {table}_{column}_trgm" for table, column in TRIGRAM_COLUMNS]
+
+
+def trigram_supported(connection) -> bool:
+    """True when the connection is PostgreSQL and the server ships pg_trgm."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        return cur.fetchone() is not None
+
+
+def fts_supported(connection) -> bool:
+    """True when the connection is SQLite with the FTS5 extension compiled in."""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cur:
+        cur.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def available(using: str = 'default') -> bool:
+    """Return True when the FTS index exists on the given database."""
+    if using not in _available:
+        connection = connections[using]
+        _available[using] = (
+            connection.vendor == 'sqlite'
+            and PRODUCT_TABLE in connection.introspection.table_names()
+        )
+    return _available[using]
+
+
+def match_expression(q: str) -> str:
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    tokens = re.findall(r'\w+', q or '')
+    return ' '.join(f'"{t}"*' for t in tokens)
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), _CHUNK):
+        yield ids[i:i + _CHUNK]
+
+
+def _placeholders(chunk):
+    return ', '.join(['%s'] * len(chunk))
+
+
+def rebuild(using: str = 'default') -> None:
+    """Repopulate both FTS tables from scratch."""
+    connection = connections[using]
+    if not available(using):
+        return
+    with connection.cursor() as cur:
+        cur.execute(f"DELETE FROM {PRODUCT_TABLE}")
+        cur.execute(f"DELETE FROM {VARIANT_TABLE}")
+        cur.execute(_PRODUCT_ROWS)
+        cur.execute(_VARIANT_ROWS)
+
+
+def reindex_products(product_ids, using: str = 'default') -> None:
+    """Refresh the product rows and all of their variant rows."""
+    if not available(using):
+        return
+    with connections[using].cursor() as cur:
+        for chunk in _chunks(product_ids):
+            ph = _placeholders(chunk)
+            cur.execute(f"DELETE FROM {PRODUCT_TABLE} WHERE rowid IN ({ph})", chunk)
+            cur.execute(f"{_PRODUCT_ROWS} WHERE p.id IN ({ph})", chunk)
+            cur.execute(
+                f"DELETE FROM {VARIANT_TABLE} WHERE rowid IN "
+                f"(SELECT id FROM inventory_variant WHERE product_id IN ({ph}))",
+                chunk,
+            )
+            cur.execute(f"{_VARIANT_ROWS} WHERE v.product_id IN ({ph})", chunk)
+
+
+def reindex_variants(variant_ids, using: str = 'default') -> None:
+    """Refresh the given variant rows (the parent product rows are not touched)."""
+    if not available(using):
+        return
+    with connections[using].cursor() as cur:
+        for chunk in _chunks(variant_ids):
+            ph = _placeholders(chunk)
+            cur.execute(f"DELETE FROM {VARIANT_TABLE} WHERE rowid IN ({ph})", chunk)
+            cur.execute(f"{_VARIANT_ROWS} WHERE v.id IN ({ph})", chunk)
+
+
+def remove_products(product_ids, using: str = 'default') -> None:
+    if not available(using):
+        return
+    with connections[using].cursor() as cur:
+        for chunk in _chunks(product_ids):
+            cur.execute(f"DELETE FROM {PRODUCT_TABLE} WHERE rowid IN ({_placeholders(chunk)})", chunk)
+
+
+def remove_variants(variant_ids, using: str = 'default') -> None:
+    if not available(using):
+        return
+    with connections[using].cursor() as cur:
+        for chunk in _chunks(variant_ids):
+            cur.execute(f"DELETE FROM {VARIANT_TABLE} WHERE rowid IN ({_placeholders(chunk)})", chunk)
+
+
+def refresh_product_row(product_id, using: str = 'default') -> None:
+    """Refresh only the product row, e.g. after one of its variant SKUs changed."""
+    if not available(using):
+        return
+    with connections[using].cursor() as cur:
+        cur.execute(f"DELETE FROM {PRODUCT_TABLE} WHERE rowid = %s", [product_id])
+        cur.execute(f"{_PRODUCT_ROWS} WHERE p.id = %s", [product_id])
+
+
+def search_products(qs, q: str):
+    """Filter a Product queryset by ``q``.
+
+    With the FTS index the queryset is joined to it and annotated with
+    ``search_rank`` (lower is better); otherwise the legacy ``icontains``
+    filters are used and no rank is available.
+    """
+    expr = match_expression(q)
+    if expr and available(qs.db):
+        return qs.extra(
+            select={'search_rank': f'{PRODUCT_TABLE}.rank'},
+            tables=[PRODUCT_TABLE],
+            where=[f'{PRODUCT_TABLE}.rowid = inventory_product.id', f'{PRODUCT_TABLE} MATCH %s'],
+            params=[expr],
+        )
+    if connections[qs.db].vendor == 'postgresql':
+        skus = Variant.objects.using(qs.db).filter(variant_sku__icontains=q).values('product_id')
+        return qs.filter(
+            Q(name__icontains=q) |
+            Q(brand__icontains=q) |
+            Q(category__icontains=q) |
+            Q(main_sku__icontains=q) |
+            Q(pk__in=skus)
+        )
+    return qs.filter(
+        Q(name__icontains=q) |
+        Q(brand__icontains=q) |
+        Q(category__icontains=q) |
+        Q(main_sku__iexact=q) |
+        Q(main_sku__icontains=q) |
+        Q(variants__variant_sku__iexact=q) |
+        Q(variants__variant_sku__icontains=q)
+    )
+
+
+def search_variants(qs, q: str):
+    """Filter a Variant queryset by ``q``; see :func:`search_products`."""
+    expr = match_expression(q)
+    if expr and available(qs.db):
+        return qs.extra(
+            select={'search_rank': f'{VARIANT_TABLE}.rank'},
+            tables=[VARIANT_TABLE],
+            where=[f'{VARIANT_TABLE}.rowid = inventory_variant.id', f'{VARIANT_TABLE} MATCH %s'],
+            params=[expr],
+        )
+    if connections[qs.db].vendor == 'postgresql':
+        products = Product.objects.using(qs.db).filter(
+            Q(name__icontains=q) | Q(brand__icontains=q) | Q(category__icontains=q)
+        ).values('pk')
+        return qs.filter(
+            Q(product__in=products) |
+            Q(variant_sku__icontains=q) |
+            Q(size__icontains=q) |
+            Q(colour__icontains=q)
+        )
+    return qs.filter(
+        Q(product__name__icontains=q) |
+        Q(product__brand__icontains=q) |
+        Q(product__category__icontains=q) |
+        Q(variant_sku__icontains=q) |
+        Q(size__icontains=q) |
+        Q(colour__icontains=q)
+    )
+
+
+def is_ranked(qs) -> bool:
+    return 'search_rank' in (qs.query.extra or {})
@@ -1,25 +1,118 @@
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-from .models import Product, Variant
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import Signal, receiver
+from .models import Product, ProductImage, Variant
 from .csv_sync import schedule_csv_sync
+from . import fragments, images, rollups, search, stats, vocab
+
+# Sent once per bulk write that bypasses save() (see inventory.bulk), inside its
+# transaction, with the affected ``product_ids`` and ``variant_ids`` and the
+# ``fields`` written.  Stats are the sender's job (stats.track_products).
+variants_changed = Signal()
+
+# Fields indexed for search, summarised in the product rollups, and
+# product fields that storefront variant cards show
+SEARCH_FIELDS = {'name', 'brand', 'category', 'size', 'colour'}
+ROLLUP_FIELDS = {'status', 'price', 'qty'}
+PRODUCT_CARD_FIELDS = {'name', 'brand', 'category'}
+
+
+@receiver(pre_save, sender=Product)
+def _product_saving(sender, instance, **kwargs):
+    instance._stats_old = None
+    if instance.pk:
+        instance._stats_old = Product.objects.filter(pk=instance.pk).values('category', 'brand').first()
 
 
 @receiver(post_save, sender=Product)
-def _product_saved(sender, instance, **kwargs):
-    schedule_csv_sync()
+def _product_saved(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stats_old', None)
+    if created or old is None:
+        stats.add_product(instance.category, instance.brand)
+    elif (old['category'], old['brand']) != (instance.category, instance.brand):
+        stats.product_recategorized(instance, old['category'], old['brand'])
+    if old is not None and (old['category'], old['brand']) != (instance.category, instance.brand):
+        vocab.invalidate(*vocab.PRODUCT_FIELDS)  # the old value may have gone
+    else:
+        for field in vocab.PRODUCT_FIELDS:
+            vocab.observe(field, getattr(instance, field))
+    search.reindex_products([instance.pk])
+    fragments.touch_products([instance.pk])  # storefront cards show product fields
+    schedule_csv_sync(product_ids=[instance.pk])
 
 
 @receiver(post_delete, sender=Product)
 def _product_deleted(sender, instance, **kwargs):
-    schedule_csv_sync()
+    stats.add_product(instance.category, instance.brand, sign=-1)
+    search.remove_products([instance.pk])
+    vocab.invalidate(*vocab.PRODUCT_FIELDS)
+    schedule_csv_sync(product_ids=[instance.pk])
+
+
+@receiver(pre_save, sender=Variant)
+def _variant_saving(sender, instance, **kwargs):
+    instance._stats_old = None
+    if instance.pk:
+        instance._stats_old = Variant.objects.select_related('product').filter(pk=instance.pk).first()
 
 
 @receiver(post_save, sender=Variant)
 def _variant_saved(sender, instance, **kwargs):
-    schedule_csv_sync()
+    old = getattr(instance, '_stats_old', None)
+    stats.replace_variant(old, instance)
+    search.reindex_variants([instance.pk])
+    if old is not None and any(getattr(old, f) != getattr(instance, f) for f in vocab.VARIANT_FIELDS):
+        vocab.invalidate(*vocab.VARIANT_FIELDS)
+    else:
+        for field in vocab.VARIANT_FIELDS:
+            vocab.observe(field, getattr(instance, field))
+    search.refresh_product_row(instance.product_id)
+    rollups.refresh([instance.product_id])
+    fragments.touch_products([instance.product_id], variants=False)
+    schedule_csv_sync(variant_ids=[instance.pk])
+
+
+@receiver(pre_delete, sender=Variant)
+def _variant_deleting(sender, instance, **kwargs):
+    # Capture the parent's dimensions while it still exists (cascading deletes)
+    instance._stats_parent = (instance.product.category, instance.product.brand)
 
 
 @receiver(post_delete, sender=Variant)
 def _variant_deleted(sender, instance, **kwargs):
-    schedule_csv_sync()
+    category, brand = getattr(instance, '_stats_parent', ('', ''))
+    stats.add_variant(instance, category, brand, sign=-1)
+    search.remove_variants([instance.pk])
+    vocab.invalidate(*vocab.VARIANT_FIELDS)
+    search.refresh_product_row(instance.product_id)
+    rollups.refresh([instance.product_id])
+    fragments.touch_products([instance.product_id], variants=False)
+    schedule_csv_sync(variant_ids=[instance.pk])
+
+
+@receiver(post_save, sender=ProductImage)
+def _image_saved(sender, instance, created, **kwargs):
+    fragments.touch_variants([instance.variant_id])
+    if created:
+        rollups.refresh(Variant.objects.filter(pk=instance.variant_id).values_list('product_id', flat=True))
+        images.schedule(instance.pk)
+
+
+@receiver(post_delete, sender=ProductImage)
+def _image_deleted(sender, instance, **kwargs):
+    images.delete_derivatives(instance)
+    rollups.refresh(Variant.objects.filter(pk=instance.variant_id).values_list('product_id', flat=True))
+    fragments.touch_variants([instance.variant_id])
+
 
+@receiver(variants_changed)
+def _variants_changed(sender, product_ids, variant_ids, fields, **kwargs):
+    if fields & SEARCH_FIELDS:
+        search.reindex_products(product_ids)
+    if fields & ROLLUP_FIELDS:
+        rollups.refresh(product_ids)
+    stale = [f for f in vocab.FIELDS if f in fields]
+    if stale:
+        vocab.invalidate(*stale)
+    # The senders stamp the rows they wrote; dashboard cards show the rollups
+    fragments.touch_products(product_ids, variants=bool(fields & PRODUCT_CARD_FIELDS))
+    schedule_csv_sync(variant_ids=variant_ids, product_ids=product_ids)
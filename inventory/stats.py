@@ -0,0 +1,262 @@
+"""Incrementally maintained KPI rollup (``InventoryStats``) for the home page.
+
+Single saves and deletes are applied as deltas from the model signals.  Bulk
+writes that bypass signals (queryset ``.update()``) wrap themselves in
+:func:`track_products`, which subtracts the affected products' contribution
+before the write and adds it back afterwards.  Deltas are summed per rollup
+key in Python first, so only keys whose totals actually move are written.
+"""
+from contextlib import contextmanager
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from .models import InventoryStats, Product, Variant
+
+_money = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _variant_measures():
+    """Aggregate expressions producing one delta per variant measure."""
+    return {
+        'variants': Count('id'),
+        'qty': Sum('qty'),
+        'price_total': Sum('price'),
+        'cost_total': Sum('cost'),
+        'stock_value': Sum(ExpressionWrapper(F('price') * F('qty'), output_field=_money)),
+        'stock_cost': Sum(ExpressionWrapper(F('cost') * F('qty'), output_field=_money)),
+        'net_total': Sum('net'),
+        'profit_total': Sum('profit'),
+        'margin_total': Sum('margin'),
+    }
+
+
+def _variant_delta(v, category, brand):
+    qty = v.qty or 0
+    price = Decimal(v.price or 0)
+    cost = Decimal(v.cost or 0)
+    key = {
+        'scope': InventoryStats.SCOPE_VARIANT,
+        'status': v.status or '',
+        'category': category or '',
+        'brand': brand or '',
+        'location': v.location or '',
+    }
+    return key, {
+        'variants': 1,
+        'qty': qty,
+        'price_total': price,
+        'cost_total': cost,
+        'stock_value': price * qty,
+        'stock_cost': cost * qty,
+        'net_total': Decimal(v.net or 0),
+        'profit_total': Decimal(v.profit or 0),
+        'margin_total': Decimal(v.margin or 0),
+    }
+
+
+def _product_key(category, brand):
+    return {
+        'scope': InventoryStats.SCOPE_PRODUCT,
+        'status': '',
+        'category': category or '',
+        'brand': brand or '',
+        'location': '',
+    }
+
+
+KEY_FIELDS = ('scope', 'status', 'category', 'brand', 'location')
+
+
+def _collect(changes, key, deltas, sign=1):
+    """Add ``sign * deltas`` to the pending change for ``key``."""
+    row = changes.setdefault(tuple(key[f] for f in KEY_FIELDS), {})
+    for k, v in deltas.items():
+        row[k] = row.get(k, 0) + sign * v
+
+
+def _apply(changes):
+    """Write pending changes: one INSERT for missing keys, one UPDATE per moved key, one DELETE."""
+    changes = {key: {k: v for k, v in deltas.items() if v} for key, deltas in changes.items()}
+    changes = {key: deltas for key, deltas in changes.items() if deltas}
+    if not changes:
+        return
+    with transaction.atomic():
+        # Missing keys start at zero; a concurrent writer may have just created them
+        InventoryStats.objects.bulk_create(
+            [InventoryStats(**dict(zip(KEY_FIELDS, key))) for key in changes],
+            ignore_conflicts=True, batch_size=500,
+        )
+        for key, deltas in changes.items():
+            InventoryStats.objects.filter(**dict(zip(KEY_FIELDS, key))).update(
+                **{k: F(k) + v for k, v in deltas.items()}
+            )
+        shrunk = [key for key, deltas in changes.items() if deltas.get('products', 0) < 0 or deltas.get('variants', 0) < 0]
+        if shrunk:
+            InventoryStats.objects.filter(
+                reduce(or_, (Q(**dict(zip(KEY_FIELDS, key))) for key in shrunk)),
+                products__lte=0, variants__lte=0,
+            ).delete()
+
+
+def _bump(key, deltas, sign=1):
+    changes = {}
+    _collect(changes, key, deltas, sign)
+    _apply(changes)
+
+
+def add_variant(variant, category, brand, sign=1):
+    key, deltas = _variant_delta(variant, category, brand)
+    _bump(key, deltas, sign)
+
+
+def replace_variant(old, new):
+    """Swap a saved variant's contribution from ``old`` (``None`` if new) to ``new``."""
+    changes = {}
+    if old is not None:
+        _collect(changes, *_variant_delta(old, old.product.category, old.product.brand), sign=-1)
+    _collect(changes, *_variant_delta(new, new.product.category, new.product.brand))
+    _apply(changes)
+
+
+def add_product(category, brand, sign=1):
+    _bump(_product_key(category, brand), {'products': 1}, sign)
+
+
+def _grouped(product_ids=None):
+    """Contribution of the given products (or all of them), grouped by rollup key."""
+    variants = Variant.objects.all()
+    products = Product.objects.all()
+    if product_ids is not None:
+        variants = variants.filter(product_id__in=product_ids)
+        products = products.filter(pk__in=product_ids)
+    # Aliases are prefixed so they cannot shadow the model's own columns
+    variant_rows = (
+        variants.values('status', 'location', 'product__category', 'product__brand')
+        .annotate(**{f'agg_{k}': v for k, v in _variant_measures().items()})
+        .order_by()
+    )
+    for row in variant_rows:
+        key = {
+            'scope': InventoryStats.SCOPE_VARIANT,
+            'status': row['status'] or '',
+            'location': row['location'] or '',
+            'category': row['product__category'] or '',
+            'brand': row['product__brand'] or '',
+        }
+        yield key, {k[4:]: v or 0 for k, v in row.items() if k.startswith('agg_')}
+    for row in products.values('category', 'brand').annotate(products=Count('id')).order_by():
+        yield _product_key(row['category'], row['brand']), {'products': row['products']}
+
+
+def _collect_products(changes, product_ids, sign=1):
+    product_ids = list(product_ids)
+    for i in range(0, len(product_ids), 500):
+        for key, deltas in _grouped(product_ids[i:i + 500]):
+            _collect(changes, key, deltas, sign)
+
+
+def add_products(product_ids, sign=1):
+    """Add (or with ``sign=-1`` subtract) the full contribution of some products."""
+    changes = {}
+    _collect_products(changes, product_ids, sign)
+    _apply(changes)
+
+
+def subtract_products(product_ids):
+    add_products(product_ids, sign=-1)
+
+
+@contextmanager
+def track_products(product_ids):
+    """Keep the rollup correct across writes that bypass model signals."""
+    product_ids = list(product_ids)
+    changes = {}
+    with transaction.atomic():
+        _collect_products(changes, product_ids, sign=-1)
+        yield
+        _collect_products(changes, product_ids)
+        _apply(changes)  # keys the write did not move cancel out
+
+
+def rebuild():
+    """Recompute every rollup row from the Variant and Product tables."""
+    with transaction.atomic():
+        InventoryStats.objects.all().delete()
+        InventoryStats.objects.bulk_create(
+            [InventoryStats(**key, **deltas) for key, deltas in _grouped()],
+            batch_size=500,
+        )
+
+
+def _top(rows, dim, field, limit=5):
+    acc = {}
+    for r in rows:
+        k = getattr(r, dim)
+        acc[k] = acc.get(k, 0) + getattr(r, field)
+    return sorted(acc.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+
+
+def summary():
+    """Read the rollup once and fold it into the figures the home page shows."""
+    rows = list(InventoryStats.objects.all())
+    variant_rows = [r for r in rows if r.scope == InventoryStats.SCOPE_VARIANT]
+    product_rows = [r for r in rows if r.scope == InventoryStats.SCOPE_PRODUCT and r.products > 0]
+    sold = [r for r in variant_rows if r.status == 'Sold']
+    unsold = [r for r in variant_rows if r.status != 'Sold']
+    listed = [r for r in variant_rows if r.status == 'Listed']
+
+    def total(rs, field):
+        return sum((getattr(r, field) for r in rs), Decimal('0'))
+
+    def count(rs, field):
+        return sum(getattr(r, field) for r in rs)
+
+    def avg(rs, field):
+        n = count(rs, 'variants')
+        return (total(rs, field) / n) if n else Decimal('0')
+
+    brand_profit = {}
+    for r in sold:
+        brand_profit[r.brand] = brand_profit.get(r.brand, Decimal('0')) + r.profit_total
+    best_brand = max(brand_profit.items(), key=lambda kv: kv[1], default=None)
+
+    return {
+        'products': count(product_rows, 'products'),
+        'variants': count(variant_rows, 'variants'),
+        'total_qty': count(variant_rows, 'qty'),
+        'sold_qty': count(sold, 'qty'),
+        'listed_qty': count(listed, 'qty'),
+        'draft_qty': count([r for r in variant_rows if r.status == 'Draft'], 'qty'),
+        'total_profit': total(sold, 'profit_total'),
+        'total_net': total(sold, 'net_total'),
+        'stock_list_value': total(unsold, 'stock_value'),
+        'stock_cost_value': total(unsold, 'stock_cost'),
+        'listed_list_value': total(listed, 'stock_value'),
+        'avg_list_price': avg(unsold, 'price_total'),
+        'avg_cost': avg(variant_rows, 'cost_total'),
+        'avg_margin': avg(sold, 'margin_total'),
+        'categories_count': len({r.category for r in product_rows}),
+        'brands_count': len({r.brand for r in product_rows if r.brand}),
+        'top_categories': _top(sold, 'category', 'qty'),
+        'top_brands': [
+            {'product__brand': brand, 'count': qty, 'profit': brand_profit.get(brand, Decimal('0'))}
+            for brand, qty in _top(sold, 'brand', 'qty')
+        ],
+        'best_profit_brand': {'product__brand': best_brand[0], 'p': best_brand[1]} if best_brand else None,
+        'top_locations': [{'location': loc, 'q': qty} for loc, qty in _top(variant_rows, 'location', 'qty')],
+    }
+
+
+def product_recategorized(product, old_category, old_brand):
+    """Move a product and its variants to the rollup rows of its new category/brand."""
+    changes = {}
+    _collect(changes, _product_key(old_category, old_brand), {'products': 1}, sign=-1)
+    _collect(changes, _product_key(product.category, product.brand), {'products': 1})
+    for key, deltas in _grouped([product.pk]):
+        if key['scope'] != InventoryStats.SCOPE_VARIANT:
+            continue
+        _collect(changes, {**key, 'category': old_category or '', 'brand': old_brand or ''}, deltas, sign=-1)
+        _collect(changes, key, deltas)
+    _apply(changes)
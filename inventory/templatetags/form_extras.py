@@ -1,4 +1,5 @@
 from django import template
+from inventory import vocab
 from inventory.constants import CO_MANAGER_GROUP
 
 register = template.Library()
@@ -16,6 +17,11 @@ def add_class(field, css):
     classes = f"{existing} {css}".strip()
     return field.as_widget(attrs={'class': classes})
 
+@register.inclusion_tag('inventory/_datalist.html')
+def vocab_datalist(field, list_id):
+    """Usage: {% vocab_datalist 'brand' 'brandsList' %} (cached suggestions from inventory.vocab)"""
+    return {'list_id': list_id, 'options': vocab.values(field)}
+
 @register.filter(name='add_attr')
 def add_attr(field, arg):
     """Usage: {{ field|add_attr:"list=categoriesList" }}"""
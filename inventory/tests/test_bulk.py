@@ -0,0 +1,56 @@
+"""Bulk edits must reject prices the money columns cannot hold."""
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from inventory import bulk
+from inventory.models import Product, Variant
+
+
+@override_settings(CSV_SYNC_ENABLED=False)
+class PriceLimitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', password='pw')
+        cls.cheap = Product.objects.create(name='Tee', category='Clothing')
+        Variant.objects.create(product=cls.cheap, size='M', price=Decimal('10.00'))
+        cls.dear = Product.objects.create(name='Watch', category='Accessories')
+        Variant.objects.create(product=cls.dear, size='One', price=Decimal('60000000.00'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post(self, **data):
+        """Submit the bulk bar for both products; returns the flashed message."""
+        response = self.client.post(reverse('inventory:bulk_update'), {'ids': [self.cheap.pk, self.dear.pk], **data})
+        self.assertEqual(response.status_code, 302)
+        return [str(m) for m in get_messages(response.wsgi_request)][-1]
+
+    def prices(self):
+        return sorted(Variant.objects.values_list('price', flat=True))
+
+    def test_typed_price_too_large(self):
+        for value in ('123456789012', '1e400', '-1e400', '100000000'):
+            with self.subTest(value=value):
+                self.assertEqual(self.post(set_price=value), 'Price is out of range (at most 99,999,999.99).')
+        self.assertEqual(self.prices(), [Decimal('10.00'), Decimal('60000000.00')])
+
+    def test_largest_price_fits(self):
+        bulk.apply([self.cheap.pk], price='99999999.99')
+        self.assertEqual(Variant.objects.get(product=self.cheap).price, Decimal('99999999.99'))
+
+    def test_reprice_past_the_limit_changes_nothing(self):
+        self.assertEqual(self.post(reprice_percent='80'), 'New prices must be at most 99,999,999.99; nothing was changed.')
+        self.assertEqual(self.prices(), [Decimal('10.00'), Decimal('60000000.00')])
+        self.dear.refresh_from_db()
+        self.assertEqual(self.dear.max_price, Decimal('60000000.00'))
+        with self.assertRaises(ValueError):
+            bulk.apply([self.cheap.pk], reprice_percent='1e400')
+
+    def test_reprice_within_the_limit(self):
+        result = bulk.apply([self.cheap.pk, self.dear.pk], reprice_percent='10')
+        self.assertEqual(result.variants, 2)
+        self.assertEqual(self.prices(), [Decimal('11.00'), Decimal('66000000.00')])
@@ -0,0 +1,154 @@
+"""EbayClient and cached_search against a local stub of the eBay OAuth and Browse APIs."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from inventory.ebay import EbayClient, cached_search, search_cache_key
+
+
+class StubEbay(ThreadingHTTPServer):
+    """Answers token requests and searches; ``fail_next`` searches get 429 + Retry-After."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.lock = threading.Lock()
+        self.token_calls = 0
+        self.search_calls = 0
+        self.fail_next = 0
+        self.retry_after = '1'
+        self.price = '10.00'
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, obj, status=200, headers=()):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with self.server.lock:
+            self.server.token_calls += 1
+        time.sleep(0.2)  # slow enough for concurrent callers to pile up
+        self._send({'access_token': 'stub-token', 'expires_in': 7200})
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.search_calls += 1
+            fail = self.server.fail_next > 0
+            if fail:
+                self.server.fail_next -= 1
+        if fail:
+            return self._send({}, 429, [('Retry-After', self.server.retry_after)])
+        self._send({'itemSummaries': [{'price': {'value': self.server.price}}]})
+
+
+class EbayStubTestCase(SimpleTestCase):
+    def setUp(self):
+        self.stub = StubEbay()
+        threading.Thread(target=self.stub.serve_forever, daemon=True).start()
+        self.addCleanup(self.stub.server_close)
+        self.addCleanup(self.stub.shutdown)
+        cache.clear()
+
+    def client_for_stub(self, **kwargs):
+        return EbayClient('id', 'secret', api_base=self.stub.url, **kwargs)
+
+
+class TokenTests(EbayStubTestCase):
+    def test_concurrent_searches_share_one_token_request(self):
+        client = self.client_for_stub()
+        threads = [threading.Thread(target=client.search, args=('hoodie',)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.stub.token_calls, 1)
+        self.assertEqual(self.stub.search_calls, 8)
+        self.assertEqual(client.metrics()['token_refreshes'], 1)
+
+
+class RetryTests(EbayStubTestCase):
+    def test_429_is_retried_after_retry_after(self):
+        client = self.client_for_stub()
+        client.search('warm up')  # token fetched outside the timing
+        self.stub.fail_next = 2
+        started = time.monotonic()
+        with self.assertLogs('inventory.ebay', 'WARNING'):
+            data = client.search('hoodie')
+        self.assertGreaterEqual(time.monotonic() - started, 2)  # Retry-After: 1, twice
+        self.assertEqual(data['itemSummaries'][0]['price']['value'], '10.00')
+        metrics = client.metrics()
+        self.assertEqual(metrics['retries'], 2)
+        self.assertEqual(metrics['errors'], 0)
+
+    def test_gives_up_after_the_retry_budget(self):
+        client = self.client_for_stub(retries=1)
+        client.search('warm up')
+        self.stub.fail_next = 5
+        self.stub.retry_after = '0'
+        with self.assertRaises(Exception) as ctx, self.assertLogs('inventory.ebay', 'WARNING'):
+            client.search('hoodie')
+        self.assertIn('429', str(ctx.exception))
+        self.assertEqual(client.metrics()['errors'], 1)
+
+
+@override_settings(EBAY_CACHE_TTL=1, EBAY_CACHE_STALE=60)
+class CachedSearchTests(EbayStubTestCase):
+    def wait_for_refresh(self, client, q):
+        key = search_cache_key(client, q, 10)
+        deadline = time.monotonic() + 5
+        while cache.get(key + ':refresh') and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def test_fresh_then_stale_while_revalidate(self):
+        client = self.client_for_stub()
+        entry, state = cached_search(client, 'Nike  Hoodie')
+        self.assertEqual((state, entry['stats']['median']), ('miss', 10.0))
+        # Same words in another case and spacing: answered from the cache
+        entry, state = cached_search(client, 'nike hoodie')
+        self.assertEqual(state, 'fresh')
+        self.assertEqual(self.stub.search_calls, 1)
+
+        time.sleep(1.1)
+        self.stub.price = '20.00'
+        entry, state = cached_search(client, 'nike hoodie')
+        # The old result comes back at once; one background refresh fetches the new one
+        self.assertEqual((state, entry['stats']['median']), ('stale', 10.0))
+        self.wait_for_refresh(client, 'nike hoodie')
+        entry, state = cached_search(client, 'nike hoodie')
+        self.assertEqual((state, entry['stats']['median']), ('fresh', 20.0))
+        self.assertEqual(self.stub.search_calls, 2)
+
+    def test_failed_refresh_keeps_serving_the_stale_entry(self):
+        client = self.client_for_stub(retries=0)
+        cached_search(client, 'hoodie')
+        time.sleep(1.1)
+        self.stub.fail_next = 1
+        with self.assertLogs('inventory.ebay', 'WARNING') as logs:
+            entry, state = cached_search(client, 'hoodie')
+            self.assertEqual(state, 'stale')
+            self.wait_for_refresh(client, 'hoodie')
+        self.assertIn('Refreshing cached eBay search', logs.output[0])
+        entry, state = cached_search(client, 'hoodie')
+        self.assertEqual((state, entry['stats']['median']), ('stale', 10.0))
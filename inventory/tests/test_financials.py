@@ -0,0 +1,57 @@
+"""``recompute_financials`` after the Vinted fee constants change (from 10% + £1.00 here)."""
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from inventory.models import Product, Variant
+
+
+@override_settings(CSV_SYNC_ENABLED=False)
+class RecomputeFinancialsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(name='Tee', category='Clothing')
+        # Stored as if saved under the old constants: fees = price * 10% + 1.00
+        cls.auto_20 = cls.variant(product, 'M', price='20.00', fees='3.00', net='17.00', profit='12.00', margin='60.00')
+        cls.auto_10 = cls.variant(product, 'L', price='10.00', fees='2.00', net='8.00', profit='3.00', margin='30.00')
+        # Typed in by hand and already consistent
+        cls.typed = cls.variant(product, 'S', price='20.00', fees='3.33', net='16.67', profit='11.67', margin='58.35')
+
+    @staticmethod
+    def variant(product, size, **money):
+        v = Variant.objects.create(product=product, size=size, cost=Decimal('5.00'), price=Decimal(money['price']))
+        Variant.objects.filter(pk=v.pk).update(**{k: Decimal(x) for k, x in money.items()})
+        return v
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('recompute_financials', '--old-percent', '0.10', '--old-fixed', '1.00', *args, stdout=out)
+        return out.getvalue()
+
+    def financials(self, variant):
+        variant.refresh_from_db()
+        return variant.fees, variant.net, variant.profit, variant.margin
+
+    def test_old_constants_are_required(self):
+        with self.assertRaises(CommandError):
+            call_command('recompute_financials', stdout=StringIO())
+
+    def test_dry_run_reports_without_writing(self):
+        out = self.run_command('--dry-run')
+        self.assertIn('Would update 2 of 3 variant(s) (fees 2, net 2, profit 2, margin 2); '
+                      'fees -2.10, profit +2.10 in total', out)
+        self.assertEqual(self.financials(self.auto_20), tuple(map(Decimal, ('3.00', '17.00', '12.00', '60.00'))))
+
+    def test_chunked_update(self):
+        out = self.run_command('--chunk-size', '1')
+        self.assertIn('2 of 3 variant(s) changed', out)
+        self.assertEqual(self.financials(self.auto_20), tuple(map(Decimal, ('1.70', '18.30', '13.30', '66.50'))))
+        self.assertEqual(self.financials(self.auto_10), tuple(map(Decimal, ('1.20', '8.80', '3.80', '38.00'))))
+        self.assertIn('0 of 3 variant(s) changed', self.run_command())
+
+    def test_hand_typed_fees_are_kept(self):
+        Variant.objects.filter(pk=self.typed.pk).update(net=0, profit=0, margin=0)
+        self.run_command()
+        self.assertEqual(self.financials(self.typed), tuple(map(Decimal, ('3.33', '16.67', '11.67', '58.35'))))
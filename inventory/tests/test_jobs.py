@@ -0,0 +1,51 @@
+"""Recovering jobs left ``running`` by workers that went away."""
+import os
+import socket
+import subprocess
+import sys
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from inventory import jobs
+from inventory.models import Job
+
+
+def _exited_pid():
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    return proc.pid
+
+
+class RequeueTests(TestCase):
+    def running(self, worker, minutes_ago=120):
+        return Job.objects.create(
+            kind=Job.KIND_EXPORT_XLSX, status=Job.RUNNING, worker=worker, done=5,
+            started_at=timezone.now() - timedelta(minutes=minutes_ago),
+        )
+
+    def status(self, job):
+        job.refresh_from_db()
+        return job.status
+
+    def test_long_job_on_live_worker_is_not_requeued(self):
+        # The test runner's parent process: alive, on this host, not us
+        job = self.running(f'{socket.gethostname()}:{os.getppid()}')
+        own = self.running(jobs.worker_id())
+        self.assertEqual(jobs.requeue_dead(), 0)
+        self.assertEqual(jobs.requeue_stale(timezone.now() - timedelta(minutes=60)), 0)
+        self.assertEqual((self.status(job), self.status(own)), (Job.RUNNING, Job.RUNNING))
+
+    def test_job_of_exited_worker_is_requeued_at_once(self):
+        job = self.running(f'{socket.gethostname()}:{_exited_pid()}', minutes_ago=1)
+        self.assertEqual(jobs.requeue_dead(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.started_at, job.done, job.worker), (Job.QUEUED, None, 0, ''))
+
+    def test_other_hosts_wait_for_the_timeout(self):
+        old = self.running('elsewhere:123', minutes_ago=120)
+        new = self.running('elsewhere:456', minutes_ago=5)
+        self.assertEqual(jobs.requeue_dead(), 0)
+        self.assertEqual(jobs.requeue_stale(timezone.now() - timedelta(minutes=60)), 1)
+        self.assertEqual((self.status(old), self.status(new)), (Job.QUEUED, Job.RUNNING))
@@ -0,0 +1,36 @@
+"""Main SKU numbering on ``Product.save``."""
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from inventory.models import Product, SkuSequence
+
+
+@override_settings(CSV_SYNC_ENABLED=False)
+class MainSkuTests(TestCase):
+    def counter(self):
+        return SkuSequence.objects.get(name=SkuSequence.MAIN_SKU).last
+
+    def counter_queries(self, fn):
+        with CaptureQueriesContext(connection) as ctx:
+            fn()
+        return [q['sql'] for q in ctx.captured_queries if SkuSequence._meta.db_table in q['sql']]
+
+    def test_typed_skus_move_the_counter(self):
+        Product.objects.create(name='Auto')  # 001, creates the counter
+        Product.objects.create(name='Typed', main_sku='050')
+        self.assertEqual(self.counter(), 50)
+        product = Product.objects.get(main_sku='050')
+        product.main_sku = '070'
+        product.save()
+        self.assertEqual(self.counter(), 70)
+        self.assertEqual(Product.objects.create(name='Next').main_sku, '071')
+
+    def test_saves_that_keep_the_sku_skip_the_counter(self):
+        Product.objects.create(name='Typed', main_sku='050')
+        product = Product.objects.get(main_sku='050')
+        product.name = 'Renamed'
+        self.assertEqual(self.counter_queries(product.save), [])
+        self.assertEqual(self.counter_queries(product.save), [])  # again, after a save
+        product.archived = True
+        self.assertEqual(self.counter_queries(lambda: product.save(update_fields=['archived'])), [])
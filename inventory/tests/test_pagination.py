@@ -0,0 +1,61 @@
+"""Keyset pagination: cursors over tied sort values, other sorts, and search rank."""
+from django.test import TestCase, override_settings
+
+from inventory import search
+from inventory.models import Product
+from inventory.pagination import encode_cursor, paginate
+
+
+@override_settings(CSV_SYNC_ENABLED=False)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Mostly tied brands, so page edges fall inside runs of equal values
+        for i, brand in enumerate(['Nike', 'Adidas', 'Nike', 'Nike', 'Adidas', 'Nike', 'Puma', 'Nike']):
+            Product.objects.create(name=f'Plain Tee {i}' if i % 2 else 'Plain Tee', brand=brand, category='Tees')
+        Product.objects.create(name='Leather Boots', brand='Nike', category='Tee shoes')
+
+    def walk(self, qs, order_by, sort, size=3):
+        """Every page forwards, then back again; returns the rows of both walks."""
+        pages = [paginate(qs, order_by, sort=sort, size=size)]
+        while pages[-1].has_next:
+            pages.append(paginate(qs, order_by, sort=sort, after=pages[-1].next_cursor, size=size))
+        back = [pages[-1]]
+        while back[-1].has_prev:
+            back.append(paginate(qs, order_by, sort=sort, before=back[-1].prev_cursor, size=size))
+        forwards = [p.pk for page in pages for p in page.items]
+        backwards = [p.pk for page in reversed(back) for p in page.items]
+        self.assertFalse(pages[0].has_prev)
+        return forwards, backwards, [[p.pk for p in page.items] for page in pages]
+
+    def test_pages_through_ties(self):
+        qs = Product.objects.all()
+        for order_by, ordering in (('brand', ['brand', 'id']), ('-brand', ['-brand', '-id']), ('-id', ['-id'])):
+            with self.subTest(order_by):
+                expected = list(qs.order_by(*ordering).values_list('pk', flat=True))
+                forwards, backwards, pages = self.walk(qs, order_by, sort=order_by)
+                self.assertEqual(forwards, expected)
+                self.assertEqual(backwards, expected)
+                self.assertEqual([len(p) for p in pages], [3, 3, 3])
+
+    def test_cursor_from_another_sort_is_ignored(self):
+        qs = Product.objects.all()
+        first = paginate(qs, 'brand', sort='brand_az', size=3)
+        by_name = paginate(qs, 'name', sort='name_az', size=3)
+        page = paginate(qs, 'brand', sort='brand_az', after=by_name.next_cursor, size=3)
+        self.assertEqual(page.items, first.items)
+        self.assertFalse(page.has_prev)
+        for bad in ('not-a-cursor', encode_cursor('brand', 'Nike', 'x')):
+            self.assertEqual(paginate(qs, 'brand', sort='brand_az', after=bad, size=3).items, first.items)
+
+    def test_search_rank_order(self):
+        qs = search.search_products(Product.objects.all(), 'tee')
+        if not search.is_ranked(qs):
+            self.skipTest('needs SQLite with FTS5')
+        qs = qs.distinct()
+        ranked = list(qs.order_by('search_rank', 'id'))
+        self.assertEqual(len(ranked), 9)
+        self.assertEqual(ranked[-1].name, 'Leather Boots')  # matched on the category only
+        forwards, backwards, _ = self.walk(qs, 'search_rank', sort='relevance', size=2)
+        self.assertEqual(forwards, [p.pk for p in ranked])
+        self.assertEqual(backwards, forwards)
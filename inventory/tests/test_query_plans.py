@@ -0,0 +1,16 @@
+"""The dashboard, storefront and export list queries use their indexes (SQLite plans)."""
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from inventory.management.commands.check_query_plans import hot_queries
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans and index names are checked on SQLite')
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_their_indexes(self):
+        for label, qs, index in hot_queries():
+            with self.subTest(label):
+                plan = qs.explain()
+                self.assertIn(index, plan, f'{label} does not use {index}:\n{plan}')
@@ -0,0 +1,68 @@
+"""The per-product rollups stay correct through the writes that move them."""
+import tempfile
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+
+from inventory import bulk
+from inventory.models import Product, ProductImage, Variant
+
+
+@override_settings(CSV_SYNC_ENABLED=False, MEDIA_ROOT=tempfile.gettempdir())
+class ProductRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name='Tee', category='Clothing')
+        cls.a = cls.variant('S', '10.00', 2, 'Listed')
+        cls.b = cls.variant('M', '30.00', 1, 'To List')
+        cls.c = cls.variant('L', '20.00', 3, 'Listed')
+
+    @classmethod
+    def variant(cls, size, price, qty, status):
+        return Variant.objects.create(product=cls.product, size=size, price=Decimal(price), qty=qty, status=status)
+
+    def assertRollups(self, count, qty, prices, status, top, image=None):
+        p = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(
+            (p.variant_count, p.total_qty, (p.min_price, p.max_price), p.dominant_status, p.top_variant_id,
+             p.primary_image_id),
+            (count, qty, tuple(Decimal(x) if x else None for x in prices), status, top.pk if top else None,
+             image.pk if image else None),
+        )
+
+    def test_created(self):
+        self.assertRollups(3, 6, ('10.00', '30.00'), 'Listed', self.b)
+
+    def test_variant_save(self):
+        self.b.price = Decimal('5.00')
+        self.b.qty = 4
+        self.b.status = 'Sold'
+        self.b.save()
+        self.assertRollups(3, 9, ('5.00', '20.00'), 'Listed', self.c)
+        self.a.status = self.c.status = 'Sold'
+        self.a.save()
+        self.c.save()
+        self.assertRollups(3, 9, ('5.00', '20.00'), 'Sold', self.c)
+
+    def test_variant_delete(self):
+        self.b.delete()
+        self.assertRollups(2, 5, ('10.00', '20.00'), 'Listed', self.c)
+        self.a.delete()
+        self.c.delete()
+        self.assertRollups(0, 0, (None, None), '', None)
+
+    def test_images(self):
+        later = ProductImage.objects.create(variant=self.c, image='products/c.jpg')
+        self.assertRollups(3, 6, ('10.00', '30.00'), 'Listed', self.b, later)
+        # The first variant's photo wins over one added earlier to a later variant
+        first = ProductImage.objects.create(variant=self.a, image='products/a.jpg')
+        self.assertRollups(3, 6, ('10.00', '30.00'), 'Listed', self.b, first)
+        first.delete()
+        self.assertRollups(3, 6, ('10.00', '30.00'), 'Listed', self.b, later)
+
+    def test_bulk_apply(self):
+        bulk.apply([self.product.pk], status='Sold', reprice_percent='50')
+        self.assertRollups(3, 6, ('15.00', '45.00'), 'Sold', self.b)
+        bulk.apply([self.product.pk], price='12.00')
+        # Every price tied: the lowest id is the top variant
+        self.assertRollups(3, 6, ('12.00', '12.00'), 'Sold', self.a)
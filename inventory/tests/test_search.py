@@ -0,0 +1,75 @@
+"""The SQLite FTS5 search index and the ``icontains`` fallback."""
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from inventory import search
+from inventory.models import Product, Variant
+
+
+@override_settings(CSV_SYNC_ENABLED=False)
+class SearchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.jacket = Product.objects.create(name='Denim Jacket', brand='Levis', category='Outerwear')
+        cls.jacket_m = Variant.objects.create(product=cls.jacket, size='M', colour='Blue', variant_sku='DJ-M-01')
+        cls.tee = Product.objects.create(name='Vintage Band Tee', brand='Nike', category='Denim')
+        Variant.objects.create(product=cls.tee, size='L', colour='Black', variant_sku='VBT-L-01')
+        cls.cafe = Product.objects.create(name='Café Racer Boots', brand='Dr Martens', category='Shoes')
+
+    def products(self, q):
+        return list(search.search_products(Product.objects.all(), q).order_by('pk'))
+
+
+class FtsSearchTests(SearchTestCase):
+    def setUp(self):
+        if not search.available():
+            self.skipTest('needs SQLite with FTS5')
+
+    def ranked(self, q):
+        return list(search.search_products(Product.objects.all(), q).order_by('search_rank'))
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(self.products('vin ni'), [self.tee])
+        self.assertEqual(self.products('dj-m'), [self.jacket])  # variant SKUs on the product row
+        self.assertEqual(self.products('cafe'), [self.cafe])  # diacritics removed
+        self.assertEqual(self.products('and'), [])  # not a prefix of any word
+
+    def test_bm25_ranks_name_over_category(self):
+        # "Denim" is the jacket's name and only the tee's category
+        self.assertEqual(self.ranked('denim'), [self.jacket, self.tee])
+
+    def test_search_variants(self):
+        found = search.search_variants(Variant.objects.all(), 'blu')
+        self.assertEqual(list(found), [self.jacket_m])
+
+    def test_index_follows_saves(self):
+        self.jacket.name = 'Waxed Coat'
+        self.jacket.save()
+        self.assertEqual(self.products('jacket'), [])
+        self.assertEqual(self.products('waxed'), [self.jacket])
+        self.jacket_m.variant_sku = 'WC-M-01'
+        self.jacket_m.save()
+        self.assertEqual(self.products('dj'), [])
+        self.assertEqual(self.products('wc'), [self.jacket])
+        self.assertEqual(list(search.search_variants(Variant.objects.all(), 'waxed')), [self.jacket_m])
+
+    def test_index_follows_deletes(self):
+        self.jacket_m.delete()
+        self.assertEqual(list(search.search_variants(Variant.objects.all(), 'dj')), [])
+        self.tee.delete()
+        self.assertEqual(self.products('vintage'), [])
+        self.assertEqual(self.products('denim'), [self.jacket])
+
+
+class FallbackSearchTests(SearchTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(search, 'available', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_icontains_fallback(self):
+        self.assertFalse(hasattr(search.search_products(Product.objects.all(), 'and').first(), 'search_rank'))
+        self.assertEqual(self.products('and'), [self.tee])  # substrings match without the index
+        self.assertEqual(self.products('dj-m-01'), [self.jacket])
+        self.assertEqual(list(search.search_variants(Variant.objects.all(), 'blue')), [self.jacket_m])
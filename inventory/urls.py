@@ -22,6 +22,13 @@ urlpatterns = [
     path('export/csv/', views.export_csv, name='export_csv'),
     path('export/xlsx/', views.export_xlsx, name='export_xlsx'),
     path('export/to-list.zip', views.export_to_list_zip, name='export_to_list_zip'),
+    # Background jobs (imports, large exports)
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job_download'),
+    # Autocomplete for category/brand/location/colour inputs
+    path('api/vocab/<str:field>', views.vocab_suggest, name='vocab_suggest'),
     # eBay API utility
     path('api/ebay/search', views.ebay_search, name='ebay_search'),
+    path('api/ebay/comps', views.ebay_comps, name='ebay_comps'),
+    path('api/ebay/metrics', views.ebay_metrics, name='ebay_metrics'),
 ]
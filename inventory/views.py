@@ -1,23 +1,42 @@
-import csv, io
-from datetime import datetime
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
 from django.urls import reverse
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User, Group
 from django.contrib.auth import login as auth_login
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth import update_session_auth_hash
-from django.db.models import Q, Sum, F, DecimalField, ExpressionWrapper, Avg, Min, Max
+from django.conf import settings
+from django.db.models import Min, Max
 import math
 from decimal import Decimal
-from .constants import STATUSES, CATEGORIES, CO_MANAGER_GROUP
-from .models import Product, Variant, ProductImage
+from .constants import STATUSES, CO_MANAGER_GROUP, EXPORT_IMAGE_MAX_EDGES
+from .models import Job, PriceComp, Product, Variant, ProductImage
 from .forms import ProductForm, VariantForm, ImportFileForm
 from .csv_sync import schedule_csv_sync
-from django.utils.text import slugify
-import zipfile, json, os
+from . import bulk, exports, fragments, jobs, search, stats, vocab
+from .filters import export_variants, filter_products
+from .pagination import paginate
+from .routers import replica_reads
+
+DASHBOARD_PAGE_SIZE = 100
+DASHBOARD_FILTER_KEYS = ('q', 'status', 'cat', 'sort', 'archived')
+
+def _filters_from_get(request):
+    return {k: (request.GET.get(k) or '').strip() for k in DASHBOARD_FILTER_KEYS}
+
+def _archived_flag(request, filters):
+    archived_flag = (filters.get('archived','') in ('1','true','yes'))
+    # Co-managers cannot view archived
+    if (
+        request.user.is_authenticated
+        and request.user.is_staff
+        and request.user.groups.filter(name=CO_MANAGER_GROUP).exists()
+    ):
+        archived_flag = False
+    return archived_flag
 
 @login_required
 def dashboard(request):
@@ -26,16 +45,9 @@ def dashboard(request):
     clear = request.GET.get('clear')
     if clear:
         request.session.pop(session_key, None)
-    keys = ('q', 'status', 'cat', 'sort', 'archived')
-    has_any = any(k in request.GET for k in keys)
+    has_any = any(k in request.GET for k in DASHBOARD_FILTER_KEYS)
     if has_any:
-        filters = {
-            'q': (request.GET.get('q') or '').strip(),
-            'status': (request.GET.get('status') or '').strip(),
-            'cat': (request.GET.get('cat') or '').strip(),
-            'sort': (request.GET.get('sort') or '').strip(),
-            'archived': (request.GET.get('archived') or '').strip(),
-        }
+        filters = _filters_from_get(request)
         request.session[session_key] = filters
     else:
         filters = request.session.get(session_key, {'q':'','status':'','cat':'','sort':'','archived':''})
@@ -44,34 +56,8 @@ def dashboard(request):
     status = filters.get('status','')
     cat = filters.get('cat','')
     sort = filters.get('sort','')
-    archived_flag = (filters.get('archived','') in ('1','true','yes'))
-    # Co-managers cannot view archived
-    if (
-        request.user.is_authenticated
-        and request.user.is_staff
-        and request.user.groups.filter(name=CO_MANAGER_GROUP).exists()
-    ):
-        archived_flag = False
-    products_qs = Product.objects.prefetch_related('variants__images')
-    if q:
-        products_qs = products_qs.filter(
-            Q(name__icontains=q) |
-            Q(brand__icontains=q) |
-            Q(category__icontains=q) |
-            Q(main_sku__iexact=q) |
-            Q(main_sku__icontains=q) |
-            Q(variants__variant_sku__iexact=q) |
-            Q(variants__variant_sku__icontains=q)
-        )
-    if status and status in STATUSES:
-        products_qs = products_qs.filter(variants__status=status)
-    if cat:
-        products_qs = products_qs.filter(category=cat)
-    # Archived filter: archived=1 shows ONLY archived; default shows ONLY active
-    if archived_flag:
-        products_qs = products_qs.filter(archived=True)
-    else:
-        products_qs = products_qs.filter(archived=False)
+    archived_flag = _archived_flag(request, filters)
+    products_qs = filter_products(Product.objects.all(), q, status, cat, archived_flag)
     # Sorting
     sort_map = {
         'created_desc': '-id',
@@ -85,23 +71,31 @@ def dashboard(request):
         'category_az': 'category',
         'category_za': '-category',
     }
+    # Ranked search results default to best match first
+    if search.is_ranked(products_qs):
+        sort_map['relevance'] = 'search_rank'
+        if not sort:
+            sort = 'relevance'
     order_by = sort_map.get(sort, '-id')
-    products = list(products_qs.order_by(order_by).distinct()[:100])
-    top_variant = None
-    top_variant_image = None
-    top_price = Decimal('-1')
-    for product in products:
-        for variant in product.variants.all():
-            if variant.price is None:
-                continue
-            if variant.price > top_price:
-                top_price = variant.price
-                top_variant = variant
-                images = list(getattr(variant, 'images').all())
-                top_variant_image = images[0] if images else None
-    # Build category suggestions from constants + DB
-    db_cats = list(Product.objects.values_list('category', flat=True).distinct())
-    cat_suggestions = sorted({*(c for c in CATEGORIES), *(c for c in db_cats if c)})
+    page = paginate(
+        products_qs.distinct(), order_by, sort=sort,
+        after=request.GET.get('after', ''), before=request.GET.get('before', ''),
+        size=DASHBOARD_PAGE_SIZE,
+    )
+    products = page.items
+    # Cards render from the product rollups; only uncached photos need a query
+    fragments.prefetch_uncached(products, ('dash_card_media',), 'primary_image')
+    # Most expensive variant on the page, from the rollups
+    top = max(
+        (p for p in products if p.top_variant_id),
+        key=lambda p: (p.max_price, -p.top_variant_id), default=None,
+    )
+    top_variant = (
+        Variant.objects.select_related('product').prefetch_related('images').filter(pk=top.top_variant_id).first()
+        if top else None
+    )
+    top_variant_image = next(iter(top_variant.images.all()), None) if top_variant else None
+    cat_suggestions = vocab.values('category')
     return render(request, 'inventory/dashboard.html', {
         'products': products,
         'q': q,
@@ -113,37 +107,36 @@ def dashboard(request):
         'show_archived': archived_flag,
         'top_variant': top_variant,
         'top_variant_image': top_variant_image,
+        'page': page,
+        'fragment_ttl': fragments.TTL,
     })
 
 @login_required
+@replica_reads
 def home(request):
-    # High-level KPIs; profit only from Sold variants
-    sold_qs = Variant.objects.filter(status='Sold')
-    listed_qs = Variant.objects.filter(status='Listed')
-    unsold_qs = Variant.objects.exclude(status='Sold')
-    total_profit = sold_qs.aggregate(total=Sum('profit'))['total'] or Decimal('0')
-    total_net = sold_qs.aggregate(total=Sum('net'))['total'] or Decimal('0')
-    # Stock-level sums (qty-aware)
-    sum_price_qty = ExpressionWrapper(F('price') * F('qty'), output_field=DecimalField(max_digits=12, decimal_places=2))
-    sum_cost_qty = ExpressionWrapper(F('cost') * F('qty'), output_field=DecimalField(max_digits=12, decimal_places=2))
-    stock_list_value = unsold_qs.aggregate(total=Sum(sum_price_qty))['total'] or Decimal('0')
-    stock_cost_value = unsold_qs.aggregate(total=Sum(sum_cost_qty))['total'] or Decimal('0')
-    listed_list_value = listed_qs.aggregate(total=Sum(sum_price_qty))['total'] or Decimal('0')
+    # High-level KPIs come from the precomputed InventoryStats rollup;
+    # profit only from Sold variants
+    kpis = stats.summary()
+    total_profit = kpis['total_profit']
+    total_net = kpis['total_net']
+    stock_list_value = kpis['stock_list_value']
+    stock_cost_value = kpis['stock_cost_value']
+    listed_list_value = kpis['listed_list_value']
 
     totals = {
-        'products': Product.objects.count(),
-        'variants': Variant.objects.count(),
-        'sold': sold_qs.aggregate(q=Sum('qty'))['q'] or 0,
-        'listed': listed_qs.aggregate(q=Sum('qty'))['q'] or 0,
-        'draft': Variant.objects.filter(status='Draft').aggregate(q=Sum('qty'))['q'] or 0,
+        'products': kpis['products'],
+        'variants': kpis['variants'],
+        'sold': kpis['sold_qty'],
+        'listed': kpis['listed_qty'],
+        'draft': kpis['draft_qty'],
     }
     # Additional metrics for richer dashboard
-    total_qty = Variant.objects.aggregate(q=Sum('qty'))['q'] or 0
+    total_qty = kpis['total_qty']
     sell_through_pct = int(((totals['sold'] or 0) / total_qty) * 100) if total_qty else 0
-    avg_list_price = unsold_qs.aggregate(a=Avg('price'))['a'] or Decimal('0')
-    avg_cost = Variant.objects.aggregate(a=Avg('cost'))['a'] or Decimal('0')
-    categories_count = Product.objects.values('category').distinct().count()
-    brands_count = Product.objects.exclude(brand='').values('brand').distinct().count()
+    avg_list_price = kpis['avg_list_price']
+    avg_cost = kpis['avg_cost']
+    categories_count = kpis['categories_count']
+    brands_count = kpis['brands_count']
     avg_profit_per_sale = (total_profit / (totals['sold'] or 1)) if totals['sold'] else Decimal('0')
     unsold_qty = max(0, (total_qty or 0) - (totals['sold'] or 0))
     # Status distribution for donut
@@ -197,47 +190,28 @@ def home(request):
     remaining_to_target = (next_target - total_profit) if next_target else Decimal('0')
     if remaining_to_target < 0:
         remaining_to_target = Decimal('0')
-    # Top categories by sold count
     # Top categories with percentage bars
-    raw_top_categories = list(
-        sold_qs.select_related('product')
-        .values('product__category')
-        .annotate(count=Sum('qty'))
-        .order_by('-count')[:5]
-    )
-    max_cat = max([row['count'] for row in raw_top_categories], default=0)
+    raw_top_categories = kpis['top_categories']
+    max_cat = max([count for _, count in raw_top_categories], default=0)
     top_categories = [
         {
-            'category': row['product__category'],
-            'count': row['count'],
-            'pct': int((row['count'] / max_cat * 100)) if max_cat else 0,
+            'category': category,
+            'count': count,
+            'pct': int((count / max_cat * 100)) if max_cat else 0,
         }
-        for row in raw_top_categories
+        for category, count in raw_top_categories
     ]
-    top_category_name = raw_top_categories[0]['product__category'] if raw_top_categories else ''
+    top_category_name = raw_top_categories[0][0] if raw_top_categories else ''
 
     # Top brands by units sold and profit
-    top_brands = list(
-        sold_qs.select_related('product')
-        .values('product__brand')
-        .annotate(count=Sum('qty'), profit=Sum('profit'))
-        .order_by('-count')[:5]
-    )
-    best_profit_brand = (
-        sold_qs.select_related('product')
-        .values('product__brand')
-        .annotate(p=Sum('profit'))
-        .order_by('-p')
-        .first()
-    )
+    top_brands = kpis['top_brands']
+    best_profit_brand = kpis['best_profit_brand']
 
     # Top locations by units (all variants)
-    top_locations = list(
-        Variant.objects.values('location').annotate(q=Sum('qty')).order_by('-q')[:5]
-    )
+    top_locations = kpis['top_locations']
     max_loc = max([row['q'] for row in top_locations], default=0)
 
-    avg_margin = sold_qs.aggregate(m=Avg('margin'))['m'] or Decimal('0')
+    avg_margin = kpis['avg_margin']
     recent = Variant.objects.select_related('product').order_by('-id')[:6]
     ctx = {
         'total_profit': total_profit,
@@ -275,31 +249,24 @@ def bulk_update(request):
     if request.method != 'POST':
         return redirect('inventory:dashboard')
     ids = request.POST.getlist('ids')
-    set_status = request.POST.get('set_status', '').strip()
-    set_location = request.POST.get('set_location', '').strip()
-    set_category = request.POST.get('set_category', '').strip()
-
     if not ids:
         messages.error(request, 'No items selected.')
         return redirect('inventory:dashboard')
 
-    # Update selected products and their variants
-    products = Product.objects.filter(pk__in=ids)
-    updated = 0
-    if set_category:
-        updated += products.update(category=set_category)
-    if set_status or set_location:
-        vqs = Variant.objects.filter(product__in=products)
-        update_kwargs = {}
-        if set_status and set_status in STATUSES:
-            update_kwargs['status'] = set_status
-        if set_location:
-            update_kwargs['location'] = set_location
-        if update_kwargs:
-            updated += vqs.update(**update_kwargs)
-
-    messages.success(request, f'Updated {updated} fields on selected items.')
-    schedule_csv_sync()
+    # Set-based: one UPDATE per field group, derived fields included (see inventory.bulk)
+    try:
+        result = bulk.apply(
+            ids,
+            category=request.POST.get('set_category', '').strip(),
+            status=request.POST.get('set_status', '').strip(),
+            location=request.POST.get('set_location', '').strip(),
+            price=request.POST.get('set_price', '').strip(),
+            reprice_percent=request.POST.get('reprice_percent', '').strip(),
+        )
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect('inventory:dashboard')
+    messages.success(request, f'Updated {result.products + result.variants} fields on selected items.')
     return redirect('inventory:dashboard')
 
 @login_required
@@ -324,17 +291,31 @@ def product_create(request):
     else:
         pform = ProductForm()
         vform = VariantForm()
-    db_cats = list(Product.objects.values_list('category', flat=True).distinct())
-    cat_suggestions = sorted({*(c for c in CATEGORIES), *(c for c in db_cats if c)})
+    cat_suggestions = vocab.values('category')
     return render(request, 'inventory/product_form.html', {'pform': pform, 'vform': vform, 'categories': cat_suggestions})
 
 @login_required
 def product_detail(request, pk):
     product = get_object_or_404(Product, pk=pk)
-    return render(request, 'inventory/product_detail.html', {'product': product})
+    variants = product.variants.select_related('price_comp')
+    return render(request, 'inventory/product_detail.html', {'product': product, 'variants': variants})
+
+@login_required
+def vocab_suggest(request, field):
+    """Autocomplete for category/brand/location/colour from the cached lists.
+    GET /api/vocab/brand?q=ni&limit=10
+    """
+    if field not in vocab.FIELDS:
+        raise Http404
+    try:
+        limit = max(1, min(int(request.GET.get('limit') or 10), 50))
+    except ValueError:
+        limit = 10
+    q = (request.GET.get('q') or '').strip()
+    return JsonResponse({'field': field, 'q': q, 'results': vocab.suggest(field, q, limit)})
 
 @login_required
-def ebay_search(request):
+async def ebay_search(request):
     """Minimal JSON proxy for eBay Browse search.
     GET /inventory/api/ebay/search?q=shoes&limit=5
     """
@@ -343,18 +324,63 @@ def ebay_search(request):
     if not q:
         return JsonResponse({'error': 'Missing q parameter'}, status=400)
     # Lazy import so missing optional dependency (requests) doesn't block app startup
-    from .ebay import get_client
+    from .ebay import cached_search, get_client
     client = get_client()
     if not client:
         return JsonResponse({'error': 'eBay not configured; set EBAY_* settings and enable EBAY_ENABLED=1'}, status=503)
     try:
-        data = client.search(q=q, limit=limit)
-        items = data.get('itemSummaries') or []
-        stats = client.summarize_prices(items)
-        return JsonResponse({'q': q, 'count': len(items), 'stats': stats, 'items': items})
+        # Blocking HTTP/cache call; off the event loop and off the shared sync thread
+        entry, cache_state = await sync_to_async(cached_search, thread_sensitive=False)(client, q=q, limit=limit)
+        items = entry['data'].get('itemSummaries') or []
+        return JsonResponse({
+            'q': q, 'count': len(items), 'stats': entry['stats'], 'items': items,
+            'cache': cache_state, 'fetched_at': entry['fetched_at'],
+        })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=502)
 
+def _comp_ids(request):
+    raw = request.POST.get('ids') or ''
+    return [int(x) for x in raw.replace(' ', '').split(',') if x.isdigit()]
+
+@login_required
+def ebay_comps(request):
+    """Price a batch of variants from eBay comps and store the result per variant.
+    POST /inventory/api/ebay/comps  ids=1,2,3  (no ids: every "To List" variant)
+
+    Runs as a background job (202 with the job) unless a few ids are given;
+    up to ``EBAY_COMPS_SYNC_MAX`` variants are priced in the request.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    from .comps import comp_variants, price_variants
+    from .ebay import get_client
+    client = get_client()
+    if not client:
+        return JsonResponse({'error': 'eBay not configured; set EBAY_* settings and enable EBAY_ENABLED=1'}, status=503)
+    ids = _comp_ids(request)
+    if _wants_background(request) or not ids or len(ids) > getattr(settings, 'EBAY_COMPS_SYNC_MAX', 20):
+        return _job_accepted(jobs.enqueue(Job.KIND_EBAY_COMPS, request.user, {'ids': ids}))
+    result = price_variants(comp_variants(ids), client)
+    comps = PriceComp.objects.filter(variant__in=comp_variants(ids)).values(
+        'variant_id', 'suggested_price', 'median', 'count', 'fetched_at',
+    )
+    return JsonResponse({
+        'priced': result.priced, 'failed': result.failed, 'queries': result.queries,
+        'comps': {c.pop('variant_id'): c for c in comps},
+    })
+
+@login_required
+def ebay_metrics(request):
+    """Call counters and latency of the shared eBay client, for monitoring (staff only)."""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    from .ebay import get_client
+    client = get_client()
+    if not client:
+        return JsonResponse({'enabled': False})
+    return JsonResponse({'enabled': True, **client.metrics()})
+
 @login_required
 def product_edit(request, pk):
     product = get_object_or_404(Product, pk=pk)
@@ -369,8 +395,7 @@ def product_edit(request, pk):
             pass
     else:
         form = ProductForm(instance=product)
-    db_cats = list(Product.objects.values_list('category', flat=True).distinct())
-    cat_suggestions = sorted({*(c for c in CATEGORIES), *(c for c in db_cats if c)})
+    cat_suggestions = vocab.values('category')
     return render(request, 'inventory/product_edit.html', {'form': form, 'product': product, 'categories': cat_suggestions})
 
 @login_required
@@ -470,7 +495,8 @@ def product_unarchive(request, pk):
         return redirect('inventory:dashboard')
     return redirect('inventory:product_detail', pk=pk)
 
-def store_index(request):
+@replica_reads
+async def store_index(request):
     # Secret development storefront: shows publicly visible listed items
     q = (request.GET.get('q') or '').strip()
     sort = (request.GET.get('sort') or '').strip()
@@ -484,18 +510,12 @@ def store_index(request):
             return None
     min_price_int = _parse_int(request.GET.get('min_price'))
     max_price_int = _parse_int(request.GET.get('max_price'))
-    items = Variant.objects.select_related('product').prefetch_related('images').filter(
+    items = Variant.objects.select_related('product').filter(
         status='Listed', product__archived=False
     )
     if q:
-        items = items.filter(
-            Q(product__name__icontains=q) |
-            Q(product__brand__icontains=q) |
-            Q(product__category__icontains=q) |
-            Q(variant_sku__icontains=q) |
-            Q(size__icontains=q) |
-            Q(colour__icontains=q)
-        )
+        # May introspect the database the first time, so not on the event loop
+        items = await sync_to_async(search.search_variants)(items, q)
     if min_price_int is not None:
         items = items.filter(price__gte=Decimal(min_price_int))
     if max_price_int is not None:
@@ -506,21 +526,27 @@ def store_index(request):
         'price_desc': '-price',
         'newest': '-id',
     }
-    items = items.order_by(order_map.get(sort, '-id'))
-    items = items[:120]
-    raw_bounds = Variant.objects.filter(status='Listed', product__archived=False).aggregate(mn=Min('price'), mx=Max('price'))
+    if search.is_ranked(items):
+        order_map['relevance'] = 'search_rank'
+        if not sort:
+            sort = 'relevance'
+    items = items.order_by(order_map.get(sort, '-id'), '-id')
+    items = [v async for v in items[:120]]
+    await sync_to_async(fragments.prefetch_uncached)(items, ('store_card',), 'images')
+    raw_bounds = await Variant.objects.filter(status='Listed', product__archived=False).aaggregate(mn=Min('price'), mx=Max('price'))
     mn = raw_bounds['mn'] or Decimal('0')
     mx = raw_bounds['mx'] or Decimal('0')
     # Round to nearest 5s for slider defaults
     mn5 = int(math.floor(float(mn) / 5.0) * 5)
     mx5 = int(math.ceil(float(mx) / 5.0) * 5)
-    return render(request, 'store.html', {
+    return await _arender(request, 'store.html', {
         'items': items,
         'q': q,
         'sort': sort,
         'min_price': min_price_int,
         'max_price': max_price_int,
         'bounds': {'mn': mn5, 'mx': mx5},
+        'fragment_ttl': fragments.TTL,
     })
 
 def _cart_get(request):
@@ -530,25 +556,37 @@ def _cart_set(request, cart):
     request.session['store_cart'] = cart
     request.session.modified = True
 
-def store_product(request, vid):
-    v = get_object_or_404(Variant.objects.select_related('product').prefetch_related('images'), pk=vid, status='Listed', product__archived=False)
+async def _acart_get(request):
+    return await request.session.aget('store_cart', {})
+
+async def _acart_set(request, cart):
+    await request.session.aset('store_cart', cart)
+
+async def _arender(request, template_name, context):
+    # Templates are sync; user, messages and session are read while rendering
+    return await sync_to_async(render)(request, template_name, context)
+
+@replica_reads
+async def store_product(request, vid):
+    v = await aget_object_or_404(Variant.objects.select_related('product').prefetch_related('images'), pk=vid, status='Listed', product__archived=False)
     if request.method == 'POST':
         # Add to cart
         qty = max(1, int(request.POST.get('qty', '1') or '1'))
-        cart = _cart_get(request)
+        cart = await _acart_get(request)
         cart[str(v.id)] = cart.get(str(v.id), 0) + qty
-        _cart_set(request, cart)
+        await _acart_set(request, cart)
         messages.success(request, f'Added {qty} × {v.product.name} ({v.size}) to cart.')
         return redirect('store_cart')
-    return render(request, 'store_detail.html', {'v': v})
+    return await _arender(request, 'store_detail.html', {'v': v})
 
-def store_cart(request):
-    cart = _cart_get(request)
+@replica_reads
+async def store_cart(request):
+    cart = await _acart_get(request)
     ids = [int(k) for k in cart.keys()]
     variants = Variant.objects.select_related('product').prefetch_related('images').filter(id__in=ids, status='Listed', product__archived=False)
     items = []
     subtotal = Decimal('0')
-    for v in variants:
+    async for v in variants:
         qty = int(cart.get(str(v.id), 0))
         line = {'v': v, 'qty': qty, 'line_total': v.price * qty}
         items.append(line)
@@ -562,14 +600,14 @@ def store_cart(request):
                 cart.pop(vid, None)
             else:
                 cart[vid] = qty
-            _cart_set(request, cart)
+            await _acart_set(request, cart)
             return redirect('store_cart')
         elif action == 'clear':
-            _cart_set(request, {})
+            await _acart_set(request, {})
             return redirect('store_cart')
         elif action == 'checkout':
             return redirect('store_checkout')
-    return render(request, 'store_cart.html', {'items': items, 'subtotal': subtotal})
+    return await _arender(request, 'store_cart.html', {'items': items, 'subtotal': subtotal})
 
 def store_checkout(request):
     cart = _cart_get(request)
@@ -623,6 +661,7 @@ def settings_view(request):
                 return redirect('inventory:settings')
     return render(request, 'inventory/settings.html', {
         'pwd_form': pwd_form,
+        'ebay_enabled': getattr(settings, 'EBAY_ENABLED', False),
     })
 
 def signup(request):
@@ -643,250 +682,123 @@ def signup(request):
             return redirect('inventory:home')
     return render(request, 'auth/signup.html')
 
+@login_required
 def import_products(request):
+    # Imports run as a background job; the page polls the job until it finishes
+    job = None
     if request.method == 'POST':
         form = ImportFileForm(request.POST, request.FILES)
         if form.is_valid():
             f = form.cleaned_data['file']
-            name = f.name.lower()
-            try:
-                if name.endswith('.csv'):
-                    decoded = f.read().decode('utf-8')
-                    # Robust delimiter detection based on header column count
-                    lines = [ln for ln in decoded.splitlines() if ln.strip()]
-                    header = lines[0] if lines else ''
-                    candidates = ['\t', ',', ';', '|']
-                    best = max(candidates, key=lambda d: len(header.split(d)))
-                    if len(header.split(best)) <= 1:
-                        best = ','
-                    reader = csv.DictReader(io.StringIO(decoded), delimiter=best)
-                    count = _ingest_rows(reader)
-                elif name.endswith('.xlsx'):
-                    try:
-                        import openpyxl
-                    except ImportError:
-                        messages.error(request, 'XLSX import requires openpyxl. Install it and try again.')
-                        return redirect('inventory:import_products')
-                    wb = openpyxl.load_workbook(f)
-                    ws = wb.active
-                    headers = [cell.value for cell in next(ws.iter_rows(min_row=1, max_row=1))]
-                    rows = (dict(zip(headers, [cell.value for cell in row])) for row in ws.iter_rows(min_row=2))
-                    count = _ingest_rows(rows)
-                else:
-                    messages.error(request, 'Unsupported file type. Please upload CSV or XLSX.')
-                    return redirect('inventory:import_products')
-                messages.success(request, f'Imported {count} rows successfully.')
-                return redirect('inventory:dashboard')
-            except Exception as e:
-                messages.error(request, f'Import failed: {e}')
+            if not f.name.lower().endswith(('.csv', '.xlsx')):
+                messages.error(request, 'Unsupported file type. Please upload CSV or XLSX.')
                 return redirect('inventory:import_products')
+            job = jobs.enqueue(Job.KIND_IMPORT, request.user, upload=f)
+            if _wants_background(request):
+                return _job_accepted(job)
+            return redirect(f"{reverse('inventory:import_products')}?job={job.pk}")
     else:
         form = ImportFileForm()
-    return render(request, 'inventory/import.html', {'form': form})
-
-def _ingest_rows(rows):
-    count = 0
-    for row in rows:
-        # Normalize header keys: trim whitespace and unify casing
-        norm = {}
-        for k, v in row.items():
-            kk = (k or '')
-            if isinstance(kk, str):
-                kk = kk.strip()
-            norm[kk] = v
-        row = norm
-        # Accept flexible headers and synonyms
-        def get_val(keys, default=''):
-            for k in keys:
-                if k in row and row.get(k) is not None:
-                    v = row.get(k)
-                    return v.strip() if isinstance(v, str) else v
-            return default
-
-        # Core fields
-        name = (get_val(['Product Name', 'Title', 'Name'], '') or '').strip()
-        if not name:
-            continue
-        brand = (get_val(['Brand'], '') or '')
-        category = (get_val(['Category'], 'Clothing') or 'Clothing')
-
-        # Optional main SKU handling (support Master/Main); zero-pad numeric
-        main_sku_in = str(get_val(['Main SKU', 'Master SKU'], '') or '').strip()
-        if main_sku_in.isdigit():
-            main_sku_in = f"{int(main_sku_in):03d}"
-
-        product = None
-        if main_sku_in:
-            product = Product.objects.filter(main_sku=main_sku_in).first()
-        if product is None:
-            product = Product.objects.create(name=name, brand=brand, category=category, main_sku=main_sku_in or '')
-
-        variant_sku_in = (get_val(['Variant SKU', 'SKU Variant'], '') or '').strip()
-        variant = None
-        if variant_sku_in:
-            variant = Variant.objects.filter(variant_sku=variant_sku_in).first()
-        if variant is None:
-            variant = Variant(product=product)
-            if variant_sku_in:
-                variant.variant_sku = variant_sku_in
-        # assign fields
-        variant.size = (get_val(['Size'], '') or '')[:40]
-        variant.condition = (get_val(['Condition'], 'Good') or 'Good')
-        variant.colour = (get_val(['Colour', 'Color'], '') or '')
-        try:
-            variant.qty = int(get_val(['Qty', 'Quantity'], 1) or 1)
-        except Exception:
-            variant.qty = 1
-        variant.location = (get_val(['Location', 'Location/Bin', 'Bin', 'Shelf'], 'Spare Room') or 'Spare Room')
-        variant.status = (get_val(['Status'], 'Draft') or 'Draft')
-        # numeric and date parsing
-        def parse_money(val):
-            if val is None: return 0
-            s = str(val).replace('£','').strip()
-            return float(s or 0)
-        def parse_date(val):
-            if not val: return datetime.now().date()
-            if isinstance(val, datetime): return val.date()
-            for fmt in ('%d/%m/%Y','%Y-%m-%d','%d-%m-%Y'):
-                try: return datetime.strptime(str(val), fmt).date()
-                except: pass
-            return datetime.now().date()
-
-        variant.date = parse_date(get_val(['Date', 'Purchase Date']))
-        variant.cost = parse_money(get_val(['Cost', 'Purchase Price', 'Buy Price']))
-        variant.price = parse_money(get_val(['Price', 'Listed Price', 'Sale Price']))
-        variant.fees = parse_money(get_val(['Fees', 'Estimated Fees', 'Platform Fees']))
-        variant.save()
-        count += 1
-    return count
+        job_id = request.GET.get('job', '')
+        if job_id.isdigit():
+            job = Job.objects.filter(pk=int(job_id), created_by=request.user, kind=Job.KIND_IMPORT).first()
+    return render(request, 'inventory/import.html', {'form': form, 'job': job})
+
+def _export_params(request):
+    """``(filters, archived_flag)`` for an export; filters are only applied when given."""
+    if not any(k in request.GET for k in DASHBOARD_FILTER_KEYS):
+        return None, False
+    filters = _filters_from_get(request)
+    return filters, _archived_flag(request, filters)
+
+def _export_variants(request):
+    return export_variants(*_export_params(request))
 
 @login_required
 def export_csv(request):
-    response = HttpResponse(content_type='text/csv')
+    response = StreamingHttpResponse(exports.stream_csv(_export_variants(request)), content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="products.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['Main SKU','Variant SKU','Product Name','Brand','Category','Size','Condition','Colour','Date','Cost','Price','Fees','Net','Profit','Margin','Qty','Location','Status'])
-    for v in Variant.objects.select_related('product').all():
-        writer.writerow([
-            v.product.main_sku, v.variant_sku, v.product.name, v.product.brand, v.product.category,
-            v.size, v.condition, v.colour, v.date.strftime('%d/%m/%Y'), f"{v.cost:.2f}", f"{v.price:.2f}", f"{v.fees:.2f}",
-            f"{v.net:.2f}", f"{v.profit:.2f}", f"{v.margin:.2f}%", v.qty, v.location, v.status
-        ])
     return response
 
+def _wants_background(request):
+    return request.GET.get('background') == '1'
+
+def _job_payload(job):
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'done': job.done,
+        'total': job.total,
+        'percent': job.percent,
+        'message': job.message,
+        'status_url': reverse('inventory:job_status', args=[job.pk]),
+        'download_url': reverse('inventory:job_download', args=[job.pk]) if job.status == Job.SUCCEEDED and job.result_path else None,
+    }
+
+def _job_accepted(job):
+    return JsonResponse(_job_payload(job), status=202)
+
 @login_required
 def export_xlsx(request):
     try:
-        import openpyxl
+        import openpyxl  # noqa: F401
     except ImportError:
         return HttpResponse("XLSX export requires openpyxl library.", status=400)
-    from openpyxl import Workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Products"
-    headers = ['Main SKU','Variant SKU','Product Name','Brand','Category','Size','Condition','Colour','Date','Cost','Price','Fees','Net','Profit','Margin','Qty','Location','Status']
-    ws.append(headers)
-    for v in Variant.objects.select_related('product').all():
-        ws.append([
-            v.product.main_sku, v.variant_sku, v.product.name, v.product.brand, v.product.category,
-            v.size, v.condition, v.colour, v.date.strftime('%d/%m/%Y'), float(v.cost), float(v.price), float(v.fees),
-            float(v.net), float(v.profit), f"{v.margin:.2f}%", v.qty, v.location, v.status
-        ])
-    bio = io.BytesIO()
-    wb.save(bio)
-    bio.seek(0)
-    resp = HttpResponse(bio.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    resp['Content-Disposition'] = 'attachment; filename="products.xlsx"'
-    return resp
+    if _wants_background(request):
+        filters, archived_flag = _export_params(request)
+        return _job_accepted(jobs.enqueue(
+            Job.KIND_EXPORT_XLSX, request.user, {'filters': filters, 'archived': archived_flag},
+        ))
+    return FileResponse(
+        exports.xlsx_tempfile(_export_variants(request)),
+        as_attachment=True,
+        filename='products.xlsx',
+        content_type=exports.XLSX_CONTENT_TYPE,
+    )
+
+def _zip_max_edge(request):
+    """Longest photo edge requested via ``?resize=`` (a marketplace key or pixels), or ``None``."""
+    resize = (request.GET.get('resize') or '').strip().lower()
+    if resize in EXPORT_IMAGE_MAX_EDGES:
+        return EXPORT_IMAGE_MAX_EDGES[resize]
+    if resize.isdigit() and 100 <= int(resize) <= 10000:
+        return int(resize)
+    return None
 
 @login_required
 def export_to_list_zip(request):
-    to_list_qs = Variant.objects.select_related('product').prefetch_related('images').filter(status='To List', product__archived=False)
+    to_list_qs = exports.to_list_variants()
+    max_edge = _zip_max_edge(request)
     if not to_list_qs.exists():
+        if _wants_background(request):
+            return JsonResponse({'error': 'No variants with status "To List" to export.'}, status=404)
         messages.info(request, 'No variants with status "To List" to export.')
         return redirect('inventory:dashboard')
+    if _wants_background(request):
+        return _job_accepted(jobs.enqueue(Job.KIND_EXPORT_TO_LIST, request.user, {'max_edge': max_edge}))
+
+    return FileResponse(
+        exports.to_list_zip_tempfile(to_list_qs, max_edge=max_edge),
+        as_attachment=True,
+        filename='to-list.zip',
+        content_type='application/zip',
+    )
 
-    mem = io.BytesIO()
-    with zipfile.ZipFile(mem, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
-        # Root manifest for marketplaces that support CSV import
-        manifest_io = io.StringIO()
-        writer = csv.DictWriter(manifest_io, fieldnames=[
-            'main_sku','variant_sku','name','brand','category','size','colour','condition','price','qty','location','date','images'
-        ])
-        writer.writeheader()
-
-        for v in to_list_qs:
-            p = v.product
-            folder_name = f"{(v.variant_sku or p.main_sku) or 'SKU'}-{slugify(p.name) or 'item'}"
-            base = f"{folder_name}/"
-
-            # Description text (simple, editable after export)
-            desc_parts = [
-                f"{p.brand} {p.name}".strip(),
-                f"Category: {p.category}",
-                f"Size: {v.size}" if v.size else None,
-                f"Colour: {v.colour}" if v.colour else None,
-                f"Condition: {v.condition}" if v.condition else None,
-                f"SKU: {v.variant_sku or p.main_sku}",
-            ]
-            description = "\n".join([s for s in desc_parts if s])
-
-            meta = {
-                'product_name': p.name,
-                'brand': p.brand,
-                'category': p.category,
-                'main_sku': p.main_sku,
-                'variant_sku': v.variant_sku,
-                'size': v.size,
-                'colour': v.colour,
-                'condition': v.condition,
-                'qty': v.qty,
-                'price': float(v.price or 0),
-                'cost': float(v.cost or 0),
-                'location': v.location,
-                'date': v.date.strftime('%Y-%m-%d') if v.date else '',
-                'status': v.status,
-            }
+def _visible_job(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    if job.created_by_id != request.user.pk and not request.user.is_superuser:
+        raise Http404
+    return job
+
+@login_required
+def job_status(request, pk):
+    return JsonResponse(_job_payload(_visible_job(request, pk)))
 
-            # Per-item files
-            zf.writestr(base + 'product.json', json.dumps(meta, indent=2))
-            zf.writestr(base + 'description.txt', description)
-
-            # Images folder
-            img_count = 0
-            for idx, img in enumerate(v.images.all(), start=1):
-                try:
-                    path = img.image.path
-                except Exception:
-                    continue
-                try:
-                    with open(path, 'rb') as fh:
-                        ext = os.path.splitext(path)[1] or '.jpg'
-                        zf.writestr(f"{base}images/{idx:02d}{ext}", fh.read())
-                        img_count += 1
-                except FileNotFoundError:
-                    continue
-
-            # Manifest row
-            writer.writerow({
-                'main_sku': p.main_sku,
-                'variant_sku': v.variant_sku,
-                'name': p.name,
-                'brand': p.brand,
-                'category': p.category,
-                'size': v.size,
-                'colour': v.colour,
-                'condition': v.condition,
-                'price': f"{v.price:.2f}",
-                'qty': v.qty,
-                'location': v.location,
-                'date': v.date.strftime('%Y-%m-%d') if v.date else '',
-                'images': img_count,
-            })
-
-        zf.writestr('manifest.csv', manifest_io.getvalue())
-
-    mem.seek(0)
-    resp = HttpResponse(mem.getvalue(), content_type='application/zip')
-    resp['Content-Disposition'] = 'attachment; filename="to-list.zip"'
-    return resp
+@login_required
+def job_download(request, pk):
+    job = _visible_job(request, pk)
+    path = jobs.result_abspath(job)
+    if job.status != Job.SUCCEEDED or path is None or not path.exists():
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=job.result_name)
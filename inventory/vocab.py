@@ -0,0 +1,79 @@
+"""Cached suggestion lists (categories, brands, locations, colours).
+
+Each list is the distinct values in the database, merged with the
+configured defaults, cached under a versioned key.  Saves add a new value
+to the cached list in place; deletes and bulk writes bump the version so
+the next read rescans.  Entries also expire after ``TTL`` seconds, which
+bounds how stale a per-process cache can get when several server
+processes each hold their own copy.
+"""
+from django.core.cache import cache
+from .constants import CATEGORIES
+from .models import Product, Variant
+
+TTL = 60 * 10
+
+FIELDS = {
+    'category': (Product, CATEGORIES),
+    'brand': (Product, ()),
+    'location': (Variant, ()),
+    'colour': (Variant, ()),
+}
+PRODUCT_FIELDS = [f for f, (model, _) in FIELDS.items() if model is Product]
+VARIANT_FIELDS = [f for f, (model, _) in FIELDS.items() if model is Variant]
+
+
+def _version_key(field):
+    return f'vocab:{field}:version'
+
+
+def _key(field):
+    version = cache.get_or_set(_version_key(field), 1, None)
+    return f'vocab:{field}:v{version}'
+
+
+def _scan(field):
+    model, defaults = FIELDS[field]
+    found = model.objects.exclude(**{field: ''}).values_list(field, flat=True).distinct()
+    return sorted({*defaults, *(v.strip() for v in found if v and v.strip())}, key=str.casefold)
+
+
+def values(field):
+    """Sorted suggestions for ``field``, from the cache when possible."""
+    key = _key(field)
+    found = cache.get(key)
+    if found is None:
+        found = _scan(field)
+        cache.set(key, found, TTL)
+    return found
+
+
+def observe(field, value):
+    """Add a just-saved value to the cached list if it is new."""
+    value = (value or '').strip()
+    if not value:
+        return
+    key = _key(field)
+    found = cache.get(key)
+    if found is not None and value not in found:
+        cache.set(key, sorted([*found, value], key=str.casefold), TTL)
+
+
+def invalidate(*fields):
+    """Drop the cached lists for ``fields`` (all when none are given)."""
+    for field in fields or FIELDS:
+        try:
+            cache.incr(_version_key(field))
+        except ValueError:  # no version yet: nothing cached
+            pass
+
+
+def suggest(field, q='', limit=10):
+    """Autocomplete: values starting with ``q`` first, then values containing it."""
+    q = (q or '').strip().casefold()
+    options = values(field)
+    if not q:
+        return options[:limit]
+    prefix = [v for v in options if v.casefold().startswith(q)]
+    inner = [v for v in options if q in v.casefold() and not v.casefold().startswith(q)]
+    return (prefix + inner)[:limit]
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+"""Small HTTP load generator for comparing the app servers.
+
+Fire requests at a running server:
+
+    python scripts/loadtest.py http://127.0.0.1:8000/store/ -c 32 -n 2000
+
+Or let the script start ``manage.py runserver`` (the old setup), gunicorn
+as configured (``gunicorn.conf.py``, uvicorn workers), gunicorn with gthread
+workers and plain uvicorn one after the other,
+hit the same paths on each, and print requests/sec and latency percentiles
+side by side.  ``--login`` signs in first, for pages such as the dashboard:
+
+    python scripts/loadtest.py --compare --path /store/ --path /inventory/ --login admin:secret
+
+Standard library only; every worker thread keeps one keep-alive connection.
+"""
+import argparse
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'runserver': [sys.executable, 'manage.py', 'runserver', '--noreload', '127.0.0.1:{port}'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '--bind', '127.0.0.1:{port}'],
+    'gthread': [
+        sys.executable, '-m', 'gunicorn', '--bind', '127.0.0.1:{port}',
+        '--worker-class', 'gthread', 'skuportal.wsgi:application',
+    ],
+    'uvicorn': [
+        sys.executable, '-m', 'uvicorn', 'skuportal.asgi:application',
+        '--host', '127.0.0.1', '--port', '{port}', '--log-level', 'warning', '--no-access-log',
+    ],
+}
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def login(base_url, credentials, login_path='/login/'):
+    """Sign in through the login form; returns the ``Cookie`` header value to send."""
+    username, _, password = credentials.partition(':')
+    u = urlsplit(base_url)
+    conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=30)
+    conn.request('GET', login_path)
+    resp = conn.getresponse()
+    resp.read()
+    cookies = SimpleCookie()
+    for header in resp.headers.get_all('Set-Cookie') or []:
+        cookies.load(header)
+    token = cookies['csrftoken'].value
+    body = urlencode({'username': username, 'password': password, 'csrfmiddlewaretoken': token})
+    conn.request('POST', login_path, body=body, headers={
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'Cookie': f'csrftoken={token}',
+        'Referer': base_url,
+    })
+    resp = conn.getresponse()
+    resp.read()
+    for header in resp.headers.get_all('Set-Cookie') or []:
+        cookies.load(header)
+    conn.close()
+    if resp.status != 302 or 'sessionid' not in cookies:
+        raise RuntimeError(f'login as {username!r} failed (HTTP {resp.status})')
+    return '; '.join(f'{k}={m.value}' for k, m in cookies.items())
+
+
+def run_load(urls, concurrency, total, timeout=30, cookie=None):
+    """Issue ``total`` GETs spread over ``urls`` from ``concurrency`` threads."""
+    parts = [urlsplit(u) for u in urls]
+    headers = {'Connection': 'keep-alive'}
+    if cookie:
+        headers['Cookie'] = cookie
+    latencies = []
+    errors = []
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def worker():
+        conn = None
+        local = []
+        failed = 0
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            u = parts[i % len(parts)]
+            path = (u.path or '/') + (f'?{u.query}' if u.query else '')
+            started = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=timeout)
+                conn.request('GET', path, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status >= 400:
+                    failed += 1
+                if resp.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                if conn is not None:
+                    conn.close()
+                conn = None
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': _percentile(latencies, 50) * 1000,
+        'p99': _percentile(latencies, 99) * 1000,
+        'max': (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(port, proc, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'server exited with status {proc.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server did not start listening on port {port}')
+
+
+def compare(paths, concurrency, total, warmup, servers=None, credentials=None):
+    rows = []
+    for label, argv in SERVERS.items():
+        if servers and label not in servers:
+            continue
+        port = _free_port()
+        proc = subprocess.Popen(
+            [a.format(port=port) for a in argv], cwd=ROOT,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            _wait_until_up(port, proc)
+            base = f'http://127.0.0.1:{port}'
+            urls = [base + p for p in paths]
+            cookie = login(base, credentials) if credentials else None
+            run_load(urls, min(concurrency, 4), warmup, cookie=cookie)
+            rows.append((label, run_load(urls, concurrency, total, cookie=cookie)))
+        finally:
+            proc.send_signal(signal.SIGINT)
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+    return rows
+
+
+def print_table(rows):
+    print(f"{'server':<10} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for label, r in rows:
+        print(
+            f"{label:<10} {r['requests']:>8} {r['errors']:>6} {r['rps']:>8.1f} "
+            f"{r['p50']:>8.1f} {r['p99']:>8.1f} {r['max']:>8.1f}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('urls', nargs='*', help='Full URLs to load (round-robin).')
+    parser.add_argument('-c', '--concurrency', type=int, default=32)
+    parser.add_argument('-n', '--requests', type=int, default=2000)
+    parser.add_argument('--compare', action='store_true', help='Start WSGI and ASGI servers and compare them.')
+    parser.add_argument('--path', action='append', default=[], help='Path to load with --compare (repeatable).')
+    parser.add_argument('--warmup', type=int, default=50, help='Untimed requests per server with --compare.')
+    parser.add_argument('--server', action='append', choices=sorted(SERVERS), help='Only these servers with --compare.')
+    parser.add_argument('--login', metavar='USER:PASSWORD', help='Sign in before loading (needed for /inventory/).')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print_table(compare(
+            args.path or ['/store/'], args.concurrency, args.requests, args.warmup, args.server, args.login,
+        ))
+    elif args.urls:
+        u = urlsplit(args.urls[0])
+        cookie = login(f'{u.scheme}://{u.netloc}', args.login) if args.login else None
+        print_table([(u.netloc, run_load(args.urls, args.concurrency, args.requests, cookie=cookie))])
+    else:
+        parser.error('give one or more URLs, or --compare')
+
+
+if __name__ == '__main__':
+    main()